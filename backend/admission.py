@@ -0,0 +1,173 @@
+# admission.py
+# 추론(YOLO/ResNet) 라우트의 동시 실행 수를 프로세스 단위와 호스트 단위로 제한합니다.
+# 한도를 넘는 요청은 짧게 대기한 뒤 503 + Retry-After로 바로 거절하거나(degradable 라우트는 임베딩을 건너뛰는
+# 축소 모드로 처리) 해서, 로그인/목록 같은 비추론 요청이 쓸 gunicorn 스레드를 항상 남겨 둡니다.
+import os
+import time
+import logging
+import tempfile
+import threading
+import contextlib
+from functools import wraps
+
+from flask import jsonify, current_app, g
+
+try:
+    import fcntl
+except ImportError:  # Windows: 호스트 단위 제한 없이 프로세스 단위로만 동작
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_POLL_INTERVAL = 0.05
+
+class ProcessLimiter:
+    """프로세스 내 실행 중(in_flight)/대기 중(waiting) 요청 수를 세는 카운팅 세마포어"""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.waiting = 0
+
+    def acquire(self, limit, max_queue, timeout):
+        """
+        슬롯을 얻으면 (True, 대기열 깊이)를 반환합니다.
+        대기열이 가득 찼거나 timeout 안에 슬롯이 나지 않으면 (False, 대기열 깊이)
+        """
+        with self.condition:
+            if self.in_flight < limit:
+                self.in_flight += 1
+                return True, 0
+            depth = self.waiting + 1
+            if self.waiting >= max_queue:
+                return False, depth
+            self.waiting += 1
+            try:
+                admitted = self.condition.wait_for(lambda: self.in_flight < limit, timeout=timeout)
+                if admitted:
+                    self.in_flight += 1
+                return admitted, depth
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+
+class HostLimiter:
+    """
+    lock_dir 안의 slot_N.lock 파일에 flock을 걸어 같은 호스트의 모든 워커 프로세스가 공유하는 슬롯 수를 제한합니다.
+    프로세스가 죽으면 OS가 잠금을 풀어 주므로 슬롯이 새지 않습니다.
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def acquire(self, lock_dir, slots, timeout):
+        if fcntl is None or slots <= 0:
+            return True
+        os.makedirs(lock_dir, exist_ok=True)
+        deadline = time.monotonic() + timeout
+        while True:
+            for slot in range(slots):
+                handle = open(os.path.join(lock_dir, f'slot_{slot}.lock'), 'a')
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    handle.close()
+                    continue
+                self.local.handle = handle
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(_POLL_INTERVAL)
+
+    def release(self):
+        handle = getattr(self.local, 'handle', None)
+        if handle is not None:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            handle.close()
+            self.local.handle = None
+
+_process_limiter = ProcessLimiter()
+_host_limiter = HostLimiter()
+
+def configure_admission(app):
+    """앱 설정에 입장 제어 기본값을 채웁니다."""
+    app.config.setdefault('ADMISSION_MAX_INFLIGHT', int(os.getenv('ADMISSION_MAX_INFLIGHT', 2)))
+    app.config.setdefault('ADMISSION_MAX_QUEUE', int(os.getenv('ADMISSION_MAX_QUEUE', 1)))
+    app.config.setdefault('ADMISSION_QUEUE_TIMEOUT', float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 5)))
+    app.config.setdefault('ADMISSION_DEGRADE_QUEUE_DEPTH', int(os.getenv('ADMISSION_DEGRADE_QUEUE_DEPTH', 1)))
+    app.config.setdefault('ADMISSION_HOST_LIMIT', int(os.getenv('ADMISSION_HOST_LIMIT', max(1, (os.cpu_count() or 2) // 2))))
+    app.config.setdefault('ADMISSION_LOCK_DIR', os.getenv('ADMISSION_LOCK_DIR', os.path.join(tempfile.gettempdir(), 'oh_project_admission')))
+    app.config.setdefault('ADMISSION_RETRY_AFTER', int(os.getenv('ADMISSION_RETRY_AFTER', 5)))
+
+@contextlib.contextmanager
+def admission_slot():
+    """
+    프로세스/호스트 슬롯을 모두 얻으면 대기열 깊이를 넘겨주고, 얻지 못하면 None을 넘겨줍니다.
+    """
+    config = current_app.config
+    admitted, depth = _process_limiter.acquire(
+        config['ADMISSION_MAX_INFLIGHT'], config['ADMISSION_MAX_QUEUE'], config['ADMISSION_QUEUE_TIMEOUT'])
+    if not admitted:
+        yield None
+        return
+    try:
+        if not _host_limiter.acquire(config['ADMISSION_LOCK_DIR'], config['ADMISSION_HOST_LIMIT'],
+                                     config['ADMISSION_QUEUE_TIMEOUT']):
+            yield None
+            return
+        try:
+            yield depth
+        finally:
+            _host_limiter.release()
+    finally:
+        _process_limiter.release()
+
+@contextlib.contextmanager
+def background_host_slot(app):
+    """
+    백그라운드 작업(일괄 등록 등)용 호스트 슬롯. 요청처럼 거절하지 않고 슬롯이 날 때까지 기다린 뒤
+    블록 동안 잡고 있어, 요청 추론과 합쳐 호스트 전체 동시 추론 수가 ADMISSION_HOST_LIMIT을 넘지 않게 합니다.
+    """
+    config = app.config
+    while not _host_limiter.acquire(config['ADMISSION_LOCK_DIR'], config['ADMISSION_HOST_LIMIT'],
+                                    config['ADMISSION_QUEUE_TIMEOUT']):
+        pass
+    try:
+        yield
+    finally:
+        _host_limiter.release()
+
+def _overloaded_response():
+    retry_after = current_app.config['ADMISSION_RETRY_AFTER']
+    response = jsonify({'error': 'AI 처리 요청이 많아 잠시 후 다시 시도해주세요.', 'retry_after': retry_after})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def inference_admission(degradable=False):
+    """
+    추론 라우트에 입장 제어를 적용하는 데코레이터. token_required 아래에 둡니다.
+    degradable=True인 라우트는 대기열을 거쳐 들어온 경우(깊이가 ADMISSION_DEGRADE_QUEUE_DEPTH 이상)
+    g.inference_degraded가 True로 설정되어 임베딩 단계를 건너뜁니다.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            with admission_slot() as depth:
+                if depth is None:
+                    logger.warning("Inference admission rejected: %s", f.__name__)
+                    return _overloaded_response()
+                g.inference_degraded = degradable and depth >= current_app.config['ADMISSION_DEGRADE_QUEUE_DEPTH'] > 0
+                if g.inference_degraded:
+                    logger.info("Inference admitted in degraded mode (queue depth %d): %s", depth, f.__name__)
+                return f(*args, **kwargs)
+        return decorated
+    return decorator
+
+def is_degraded():
+    """현재 요청이 임베딩을 건너뛰는 축소 모드인지 여부"""
+    return g.get('inference_degraded', False)
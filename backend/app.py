@@ -1,86 +1,159 @@
 # app.py
-import numpy as np
-from PIL import Image
-import os, json, logging, datetime, torch
-import torchvision.transforms as transforms
-from torchvision import models
-from sklearn.metrics.pairwise import cosine_similarity
+import os, json, logging, datetime, time
 from werkzeug.utils import secure_filename
-from flask import Flask, request, jsonify, send_from_directory, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+from flask import Flask, Blueprint, request, jsonify, send_from_directory, current_app
 from flask_cors import CORS
 from dotenv import load_dotenv
 from flask_migrate import Migrate
 
-from .my_models import db, User, LostItem, LostReport
-from .auth import auth_bp, token_required, admin_required, generate_token  # <-- generate_token 추가 임포트
-from .my_backend_utils import preprocess_image, postprocess_detections # 새로운 유틸리티 임포트!
-
-# 로깅 설정: 디버그 레벨로 상세 로그 출력
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+from .my_models import db, LostItem, LostReport, ObjectEmbedding, ArchivedLostItem
+from .auth import auth_bp, token_required, admin_required
+from .my_backend_utils import allowed_file, get_upload_directory # 새로운 유틸리티 임포트!
+from . import inference
+from .inference import extract_features, extract_object_features, detect_objects_yolov5, inference_check_command
+from .bulk_ingest import bulk_bp, bulk_ingest_command
+from .detect import detect_bp
+from .dedupe import dedupe_bp, find_duplicate
+from .image_hash import compute_file_hash
+from .object_search import object_search_bp, object_embedding_rows
+from .admission import configure_admission, inference_admission, is_degraded
+from .upload_guard import UploadRejected, save_upload, request_body_limit
+from .database import configure_database, init_database, run_write
+from .db_routing import prefer_replica
+from .response_cache import cached_listing
+from .json_provider import FastJSONProvider, dumps as json_dumps, json_benchmark_command
+from .embedding_index import embedding_index_bp, pq_train_command, pq_eval_command
+from .passwords import configure_passwords, login_benchmark_command
+from .profiling import profiling_bp, configure_profiling, init_profiling
+from .logging_setup import configure_logging, sampled_log
+from .matching import configure_matching, make_query, make_candidate, find_matches
+from .lifecycle import (lifecycle_bp, configure_lifecycle, archive_lost_items_command, include_archived_requested,
+                        archived_items)
+
+# 로깅 설정: LOG_LEVEL(기본 INFO) 레벨로 큐를 거쳐 백그라운드 스레드에서 JSON 로그 출력
+configure_logging()
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__, static_folder='build')
-CORS(app)
-load_dotenv() # .env 파일 로드
-
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///users.db')
-app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER', 'uploads')
-app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'your_jwt_secret_key')
-print(f"DEBUG(app.py): App config JWT_SECRET_KEY loaded: '{app.config.get('JWT_SECRET_KEY')}'")
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = datetime.timedelta(days=1)
-
-UPLOAD_DIRECTORY_PATH = os.path.join(app.root_path, app.config['UPLOAD_FOLDER'])
-os.makedirs(UPLOAD_DIRECTORY_PATH, exist_ok=True)
-logger.info(f"UPLOAD_DIRECTORY_PATH: {UPLOAD_DIRECTORY_PATH} (Exists: {os.path.exists(UPLOAD_DIRECTORY_PATH)})")
-
-db.init_app(app)  # db 초기화 (기존 코드)
-
-# Flask-Migrate 초기화
-migrate = Migrate(app, db)  # 이 라인이 추가되어야 합니다.
-
-# ====================================================================
-# 허용된 파일 확장자 함수
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
-
-def allowed_file(filename):
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-# ====================================================================
+api_bp = Blueprint('api', __name__)
+migrate = Migrate()
 
-# YOLOv5 모델 로드
-YOLO_MODEL_PATH = os.getenv('YOLO_MODEL_PATH', 'yolov5')
-model = None
-try:
-    # 'yolov5s'가 공식 모델명입니다. 'y5s'는 잘못된 이름이므로 반드시 'yolov5s'로 변경하세요!
-    model = torch.hub.load(
-        YOLO_MODEL_PATH,
-        'yolov5s',  # <-- 반드시 'yolov5s'로!
-        source='local',
-        pretrained=True
-    )
-    logger.info("YOLOv5 model loaded successfully.")
-    model.eval()
-except Exception as e:
-    logger.error(f"Error loading YOLOv5 model: {e}", exc_info=True)
-    model = None
-
-with app.app_context():
-    db.create_all()
+def create_app(config=None):
+    """
+    Flask 앱을 생성합니다. ML 모델은 여기서 로드하지 않습니다.
+    (첫 요청 시 백그라운드에서 워밍업되며, CLI/마이그레이션 명령은 모델을 전혀 로드하지 않습니다.)
+    """
+    start = time.perf_counter()
+    load_dotenv() # .env 파일 로드
+
+    app = Flask(__name__, static_folder='build')
+    # jsonify/app.json 직렬화 (orjson이 있으면 orjson, NumPy 배열과 datetime 직접 처리)
+    app.json = FastJSONProvider(app)
+    CORS(app)
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///users.db')
+    app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER', 'uploads')
+    app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'your_jwt_secret_key')
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = datetime.timedelta(days=1)
+    # 첫 요청 시 모델을 백그라운드로 미리 로드할지 여부
+    app.config['INFERENCE_WARMUP'] = os.getenv('INFERENCE_WARMUP', '1') == '1'
+
+    # 일괄 등록 설정
+    app.config['BULK_INGEST_WORKERS'] = int(os.getenv('BULK_INGEST_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+    app.config['BULK_INGEST_BATCH_SIZE'] = int(os.getenv('BULK_INGEST_BATCH_SIZE', 16))
+    app.config['BULK_INGEST_COMMIT_SIZE'] = int(os.getenv('BULK_INGEST_COMMIT_SIZE', 200))
+    # HTTP 일괄 등록 백그라운드 작업: 재사용하는 추론 풀 크기, 프로세스당 대기 작업 수, 상태 파일 디렉터리
+    app.config['BULK_HTTP_WORKERS'] = int(os.getenv('BULK_HTTP_WORKERS', 1))
+    app.config['BULK_JOB_MAX_PENDING'] = int(os.getenv('BULK_JOB_MAX_PENDING', 4))
+    app.config['BULK_JOB_DIR'] = os.getenv('BULK_JOB_DIR', os.path.join(app.root_path, 'bulk_jobs'))
+
+    # 배치 감지 요청당 최대 이미지 수
+    app.config['DETECT_BATCH_MAX_IMAGES'] = int(os.getenv('DETECT_BATCH_MAX_IMAGES', 16))
+
+    # 추론 라우트 입장 제어 (ADMISSION_MAX_INFLIGHT + ADMISSION_MAX_QUEUE는 gunicorn 스레드 수보다 작게 두어
+    # 로그인/목록 요청용 스레드를 남겨 둡니다)
+    configure_admission(app)
+
+    # LostItem 보관 기준 (보관 기간, 배치 크기)
+    configure_lifecycle(app)
+
+    # 지역 파티션 매칭 (매처 프로세스 수, 지역/이웃 지역 설정)
+    configure_matching(app)
+
+    # 비밀번호 해시 방식/워커 풀 크기와 로그인 실패 제한
+    configure_passwords(app)
+
+    # 요청 프로파일링 (저장 위치/개수, 무작위 샘플링 비율)
+    configure_profiling(app)
+
+    # 업로드 크기 제한: 요청 본문 전체(MAX_CONTENT_LENGTH, 초과 시 본문을 받기 전에 413)와
+    # 파일 1개(UPLOAD_MAX_FILE_BYTES, upload_guard에서 헤더 검사/스트리밍 저장 중에 확인).
+    # 기본 한도는 이미지 한 장 크기이고, 여러 장을 받는 일괄 등록/배치 감지 라우트만 allow_request_body로 늘립니다.
+    app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', request_body_limit(1)))
+    app.config['BULK_MAX_CONTENT_LENGTH'] = int(os.getenv('BULK_MAX_CONTENT_LENGTH', 256 * 1024 * 1024))
+
+    # 근접 중복 탐지 설정 (pHash 해밍 거리, 중복이면 기존 추론 결과 재사용 여부)
+    app.config['DEDUP_DISTANCE'] = int(os.getenv('DEDUP_DISTANCE', 6))
+    app.config['DEDUP_SKIP_INFERENCE'] = os.getenv('DEDUP_SKIP_INFERENCE', '0') == '1'
+
+    if config:
+        app.config.update(config)
+
+    upload_directory_path = os.path.join(app.root_path, app.config['UPLOAD_FOLDER'])
+    os.makedirs(upload_directory_path, exist_ok=True)
+    logger.info("UPLOAD_DIRECTORY_PATH: %s (Exists: %s)", upload_directory_path, os.path.exists(upload_directory_path))
+
+    configure_database(app)
+    db.init_app(app)
+    init_database(app)
+    init_profiling(app)
+    # Flask-Migrate 초기화
+    migrate.init_app(app, db)
+
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(bulk_bp)
+    app.register_blueprint(detect_bp)
+    app.register_blueprint(dedupe_bp)
+    app.register_blueprint(object_search_bp)
+    app.register_blueprint(lifecycle_bp)
+    app.register_blueprint(embedding_index_bp)
+    app.register_blueprint(profiling_bp)
+    app.register_blueprint(api_bp)
+    app.cli.add_command(bulk_ingest_command)
+    app.cli.add_command(inference_check_command)
+    app.cli.add_command(json_benchmark_command)
+    app.cli.add_command(archive_lost_items_command)
+    app.cli.add_command(pq_train_command)
+    app.cli.add_command(pq_eval_command)
+    app.cli.add_command(login_benchmark_command)
+
+    if app.config['INFERENCE_WARMUP']:
+        @app.before_request
+        def start_inference_warmup():
+            # 요청을 처리하는 프로세스에서만 워밍업 (CLI 명령에서는 실행되지 않음)
+            inference.warm_up_async()
+
+    with app.app_context():
+        db.create_all()
+
+    app.config['STARTUP_SECONDS'] = time.perf_counter() - start
+    logger.info("App created in %.3fs (ML models not loaded yet).", app.config['STARTUP_SECONDS'])
+    return app
 
 # --- parse_predictions 함수 개선 ---
 def parse_predictions(detection_results):
     """
     JSON 문자열 형태의 감지 결과를 파싱하여 유효한 리스트 형태로 반환합니다.
-    새로운 postprocess_detections 함수에서 반환하는 형식에 맞춰 재구성.
+    decode_detections 함수에서 반환하는 형식에 맞춰 재구성.
     """
     try:
         if not detection_results:
-            logger.debug("parse_predictions: detection_results is empty or None. Returning empty list.")
+            sampled_log(logger, logging.DEBUG, "parse_predictions: detection_results is empty or None. Returning empty list.")
             return []
         
         if not isinstance(detection_results, str):
-            logger.warning(f"parse_predictions: detection_results is not a string, type: {type(detection_results)}. Attempting to stringify.")
-            detection_results = json.dumps(detection_results)
+            logger.warning("parse_predictions: detection_results is not a string, type: %s. Attempting to stringify.", type(detection_results))
+            detection_results = json_dumps(detection_results)
 
         parsed_data = json.loads(detection_results)
         
@@ -92,31 +165,31 @@ def parse_predictions(detection_results):
                     validated_predictions.append(p)
                     continue
 
-                # my_backend_utils.postprocess_detections에서 반환하는 형식에 맞춰 변경
+                # my_backend_utils.decode_detections에서 반환하는 형식에 맞춰 변경
                 # { 'box': {'x': ..., 'y': ..., 'width': ..., 'height': ...}, 'confidence': ..., 'label': ... }
                 if 'label' in p and 'confidence' in p and 'box' in p:
                     try:
                         score_val = float(p['confidence']) # 'confidence' 키 사용
                         if not (0.0 <= score_val <= 1.0):
-                            logger.warning(f"Invalid confidence range found in DB: {p.get('confidence')}. Defaulting to 0.0.")
+                            sampled_log(logger, logging.WARNING, "Invalid confidence range found in DB: %s. Defaulting to 0.0.", p.get('confidence'))
                             score_val = 0.0
                         validated_predictions.append({**p, 'confidence': score_val})
                     except (ValueError, TypeError):
-                        logger.warning(f"Invalid confidence format found in DB: {p.get('confidence')}. Defaulting to 0.0.")
+                        sampled_log(logger, logging.WARNING, "Invalid confidence format found in DB: %s. Defaulting to 0.0.", p.get('confidence'))
                         validated_predictions.append({**p, 'confidence': 0.0})
                 else:
-                    logger.warning(f"Prediction item missing 'label', 'confidence' or 'box': {p}")
+                    sampled_log(logger, logging.WARNING, "Prediction item missing 'label', 'confidence' or 'box': %s", p)
             return validated_predictions
         elif isinstance(parsed_data, dict) and ('error' in parsed_data or 'info' in parsed_data or 'warning' in parsed_data):
             return [parsed_data]
         else:
-            logger.warning(f"parse_predictions: Unexpected parsed data type or format: {type(parsed_data)}, data: {parsed_data}")
+            logger.warning("parse_predictions: Unexpected parsed data type or format: %s, data: %s", type(parsed_data), parsed_data)
             return []
     except json.JSONDecodeError as jde:
-        logger.warning(f"JSON parsing error in parse_predictions: {jde}, Raw data: '{detection_results}'")
+        logger.warning("JSON parsing error in parse_predictions: %s, Raw data: '%s'", jde, detection_results)
         return [{"error": f"감지 결과 파싱 오류: {jde}"}]
     except Exception as e:
-        logger.error(f"Unexpected exception during prediction parsing: {e}", exc_info=True)
+        logger.error("Unexpected exception during prediction parsing: %s", e, exc_info=True)
         return [{"error": f"알 수 없는 파싱 오류: {e}"}]
 
 def item_to_dict(item):
@@ -126,30 +199,71 @@ def item_to_dict(item):
         "imageUrl": item.image_url,
         "description": item.description,
         "location": item.location,
-        "upload_date": (item.created_at or item.upload_date).isoformat() if hasattr(item, 'created_at') else item.upload_date.isoformat(),
+        "upload_date": (item.created_at or item.upload_date) if hasattr(item, 'created_at') else item.upload_date,
         "predictions": parse_predictions(item.detection_results),
-        "user_id": item.user_id
+        "user_id": item.user_id,
+        "status": item.status,
+        "archived": isinstance(item, ArchivedLostItem)
     }
 
+def skip_duplicate_inference():
+    """근접 중복 업로드의 추론을 건너뛸지 여부 (요청의 skip_duplicate_inference 값이 설정값보다 우선)"""
+    requested = request.form.get('skip_duplicate_inference')
+    if requested is not None:
+        return requested.lower() in ('1', 'true', 'yes')
+    return current_app.config['DEDUP_SKIP_INFERENCE']
+
+def duplicate_summary(duplicate, distance):
+    if duplicate is None:
+        return None
+    return {"item_id": duplicate.id, "distance": distance, "imageUrl": duplicate.image_url}
+
+def collect_object_features(filepath, detections, reused_item=None):
+    """
+    감지된 객체별 (감지 결과, 크롭 임베딩) 목록을 만듭니다. (추론은 쓰기 작업 밖, 요청 스레드에서 수행)
+    추론을 건너뛴 중복 업로드는 기존 항목의 객체 임베딩을 그대로 사용하고, 축소 모드에서는 건너뜁니다.
+    """
+    if is_degraded():
+        return []
+    if reused_item is not None:
+        return [({'label': obj.label, 'confidence': obj.confidence, 'box': obj.box}, obj.feature_vector)
+                for obj in reused_item.object_embeddings]
+    return extract_object_features(filepath, detections)
+
+def insert_lost_item_job(fields, object_features=()):
+    """LostItem 한 건과 객체 임베딩을 추가하고 새 항목 id를 반환하는 run_write용 쓰기 작업"""
+    def job(session):
+        item = LostItem(**fields)
+        session.add(item)
+        session.flush()
+        rows = object_embedding_rows(item.id, object_features)
+        if rows:
+            session.bulk_insert_mappings(ObjectEmbedding, rows)
+        return item.id
+    return job
+
 def lost_report_to_dict(report):
     return {
         "id": report.id,
         "userId": report.user_id,
         "itemDescription": report.item_description,
         "lostLocation": report.lost_location,
-        "lostDate": report.lost_date.isoformat() if report.lost_date else None,
+        "lostDate": report.lost_date,
         "imageUrl": report.image_url,
         "detectionResults": parse_predictions(report.detection_results)
     }
 
-@app.route('/uploads/<path:filename>')
+@api_bp.route('/uploads/<path:filename>')
 def uploaded_file(filename):
-    file_full_path = os.path.join(UPLOAD_DIRECTORY_PATH, filename)
-    logger.debug(f"Serving file request for: {filename} from {UPLOAD_DIRECTORY_PATH}. File exists: {os.path.exists(file_full_path)}")
-    return send_from_directory(UPLOAD_DIRECTORY_PATH, filename)
+    upload_directory_path = get_upload_directory()
+    file_full_path = os.path.join(upload_directory_path, filename)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Serving file request for: %s from %s. File exists: %s", filename, upload_directory_path, os.path.exists(file_full_path))
+    return send_from_directory(upload_directory_path, filename)
 
-@app.route('/api/detect_object', methods=['POST'])
+@api_bp.route('/api/detect_object', methods=['POST'])
 @token_required
+@inference_admission()
 def detect_object_and_upload(current_user):
     if 'image' not in request.files:
         return jsonify({"error": "이미지 파일이 필요합니다."}), 400
@@ -162,7 +276,7 @@ def detect_object_and_upload(current_user):
         try:
             filename = secure_filename(file.filename)
             filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
+            save_upload(file, filepath)
 
             detection_results = detect_objects_yolov5(filepath)
             
@@ -173,24 +287,32 @@ def detect_object_and_upload(current_user):
             return jsonify({
                 "message": "이미지 업로드 및 감지 성공",
                 "image_url": f"/{display_image_url}",
-                "predictions": [{"label": label, "score": 1.0} for label in detection_results]
+                "predictions": detection_results
             }), 200
 
+        except UploadRejected as e:
+            return jsonify({"error": e.message}), e.status_code
         except Exception as e:
-            current_app.logger.error(f"사용자 이미지 처리 중 서버 오류: {e}", exc_info=True)
+            current_app.logger.error("사용자 이미지 처리 중 서버 오류: %s", e, exc_info=True)
             return jsonify({"error": f"이미지 처리 중 서버 오류가 발생했습니다: {str(e)}"}), 500
     else:
         return jsonify({"error": "허용되지 않는 파일 형식입니다."}), 400
 
-@app.route('/api/user/uploaded_items', methods=['GET'])
+@api_bp.route('/api/user/uploaded_items', methods=['GET'])
 @token_required
 def get_uploaded_items(current_user):
-    items = LostItem.query.filter_by(user_id=current_user.id).all()
-    return jsonify([item_to_dict(item) for item in items]), 200
+    criteria = [LostItem.user_id == current_user.id]
 
-@app.route('/api/admin/upload_item', methods=['POST'])
-@token_required
+    def build():
+        items = LostItem.query.filter(*criteria).all()
+        if include_archived_requested():
+            items += archived_items(ArchivedLostItem.user_id == current_user.id)
+        return [item_to_dict(item) for item in items]
+    return cached_listing(('uploaded_items', current_user.id), criteria, build)
+
+@api_bp.route('/api/admin/upload_item', methods=['POST'])
 @admin_required
+@inference_admission(degradable=True)
 def admin_upload_item(current_user):
     image_file = request.files.get('image')
     description = request.form.get('description')
@@ -200,69 +322,59 @@ def admin_upload_item(current_user):
         return jsonify({'error': '이미지, 설명, 장소를 모두 입력하세요.'}), 400
 
     filename = secure_filename(image_file.filename)
-    filepath = os.path.join(UPLOAD_DIRECTORY_PATH, filename)
+    filepath = os.path.join(get_upload_directory(), filename)
     image_url = f"/uploads/{filename}"
 
     try:
-        image_file.save(filepath)
-        logger.info(f"Image saved to {filepath} for /api/admin/upload_item")
-
-        detection_results_data = [] # my_backend_utils.postprocess_detections 함수가 반환하는 형식으로 저장
-        if app.config['YOLO_MODEL']:
-            try:
-                img = Image.open(filepath).convert('RGB')
-                original_width, original_height = img.size
-
-                processed_img_tensor = preprocess_image(img)
-                if processed_img_tensor is None:
-                    raise ValueError("Image preprocessing failed.")
-                
-                results = app.config['YOLO_MODEL'](processed_img_tensor)
-
-                if hasattr(results, 'xyxy') and results.xyxy is not None and len(results.xyxy) > 0:
-                    detection_results_data = postprocess_detections(results, original_width, original_height)
-                    logger.info(f"관리자 업로드 - 이미지 감지 성공: {len(detection_results_data)}개 객체 발견. Detections: {detection_results_data}")
-                    if not detection_results_data:
-                        detection_results_data.append({"info": "이미지에서 감지된 물건이 없습니다."})
-                else:
-                    logger.info("YOLO 모델이 객체를 감지하지 못했거나 결과 형식이 예상과 다릅니다: /api/admin/upload_item.")
-                    detection_results_data.append({"info": "이미지에서 감지된 물건이 없습니다."})
-
-            except Exception as yolo_e:
-                logger.error(f"관리자 업로드 중 YOLO 감지 오류: {yolo_e}", exc_info=True)
-                detection_results_data = [{"error": f"YOLO 감지 처리 실패: {str(yolo_e)}"}]
+        save_upload(image_file, filepath)
+        logger.info("Image saved to %s for /api/admin/upload_item", filepath)
+
+        image_hash = compute_file_hash(filepath)
+        duplicate, duplicate_distance = find_duplicate(image_hash)
+        reused_item = duplicate if duplicate is not None and skip_duplicate_inference() else None
+        if reused_item is not None:
+            # 근접 중복 이미지는 기존 감지 결과를 재사용합니다.
+            detection_results_data = parse_predictions(duplicate.detection_results)
         else:
-            logger.warning("YOLO 모델이 로드되지 않아 관리자 업로드 시 객체 감지를 수행할 수 없습니다.")
-            detection_results_data = [{"warning": "YOLO 모델이 백엔드에 로드되지 않았습니다."}]
+            # YOLOv5 객체 감지 (decode_detections 형식, 결과가 없거나 실패하면 info/warning/error 메시지)
+            detection_results_data = detect_objects_yolov5(filepath)
+        logger.info("관리자 업로드 - 이미지 감지 완료: %d개 항목", len(detection_results_data))
+        logger.debug("Detections: %s", detection_results_data)
 
-        new_item = LostItem(
+        object_features = collect_object_features(filepath, detection_results_data, reused_item)
+        item_id = run_write(insert_lost_item_job(dict(
             user_id=current_user.id,
             image_url=image_url,
             description=description,
             location=location,
-            detection_results=json.dumps(detection_results_data) # my_backend_utils 형식으로 저장
-        )
-        db.session.add(new_item)
-        db.session.commit()
+            detection_results=json_dumps(detection_results_data), # my_backend_utils 형식으로 저장
+            phash=image_hash
+        ), object_features))
         return jsonify({
             'message': '물건 정보가 성공적으로 등록되었습니다!',
-            'item_id': new_item.id,
+            'item_id': item_id,
             'image_url': image_url,
-            'predictions': detection_results_data
+            'predictions': detection_results_data,
+            'duplicate_of': duplicate_summary(duplicate, duplicate_distance)
         }), 200
+    except UploadRejected as e:
+        return jsonify({'error': e.message}), e.status_code
     except Exception as e:
-        logger.error(f"Error during admin upload item processing: {e}", exc_info=True)
+        logger.error("Error during admin upload item processing: %s", e, exc_info=True)
         return jsonify({'error': f'관리자 물건 업로드 중 서버 오류: {str(e)}'}), 500
 
 
-@app.route('/api/admin/all_lost_items', methods=['GET'])
-@token_required
+@api_bp.route('/api/admin/all_lost_items', methods=['GET'])
 @admin_required
 def get_all_lost_items(current_user):
-    all_items = LostItem.query.all()
-    return jsonify({'all_items': [item_to_dict(item) for item in all_items]}), 200
-
-@app.route('/api/user/profile', methods=['GET'])
+    def build():
+        items = LostItem.query.all()
+        if include_archived_requested():
+            items += archived_items()
+        return {'all_items': [item_to_dict(item) for item in items]}
+    return cached_listing(('all_lost_items',), [], build)
+
+@api_bp.route('/api/user/profile', methods=['GET'])
 @token_required
 def get_user_profile(current_user):
     return jsonify({
@@ -272,21 +384,31 @@ def get_user_profile(current_user):
         "is_admin": current_user.is_admin
     }), 200
 
-@app.route('/health')
+@api_bp.route('/health')
 def health_check():
     return 'Flask 서버가 정상적으로 동작 중입니다.', 200
 
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
+@api_bp.route('/health/ready')
+def readiness_check():
+    # 'serving'은 요청 처리 가능, 'models_warm'은 ML 모델까지 로드 완료를 의미합니다.
+    models_warm = inference.models_warm()
+    return jsonify({
+        'status': 'ready' if models_warm else 'warming',
+        'serving': True,
+        'models_warm': models_warm,
+        'models': inference.models_status(),
+        'startup_seconds': current_app.config.get('STARTUP_SECONDS'),
+    }), 200 if models_warm else 503
+
+@api_bp.route('/', defaults={'path': ''})
+@api_bp.route('/<path:path>')
 def serve_react(path):
-    if path != "" and os.path.exists(os.path.join(app.static_folder, path)):
-        return send_from_directory(app.static_folder, path)
+    if path != "" and os.path.exists(os.path.join(current_app.static_folder, path)):
+        return send_from_directory(current_app.static_folder, path)
     else:
-        return send_from_directory(app.static_folder, 'index.html')
-
-app.register_blueprint(auth_bp)
+        return send_from_directory(current_app.static_folder, 'index.html')
 
-@app.route('/api/lost_items', methods=['POST'])
+@api_bp.route('/api/lost_items', methods=['POST'])
 @token_required
 def create_lost_item(current_user):
     data = request.get_json()
@@ -303,26 +425,32 @@ def create_lost_item(current_user):
 
     detection_results_to_save = detection_results_json
 
-    new_item = LostItem(
+    item_id = run_write(insert_lost_item_job(dict(
         user_id=current_user.id,
         image_url=image_url,
         description=description,
         location=location,
         detection_results=detection_results_to_save
-    )
-    db.session.add(new_item)
-    db.session.commit()
-    logger.info(f"New lost item created by user {current_user.id}: {new_item.id}. Image: {image_url}, Detections: {detection_results_to_save}")
-    return jsonify({'message': '물건 정보가 성공적으로 저장되었습니다!', 'item_id': new_item.id}), 201
+    )))
+    logger.info("New lost item created by user %s: %s. Image: %s", current_user.id, item_id, image_url)
+    logger.debug("Detections for lost item %s: %s", item_id, detection_results_to_save)
+    return jsonify({'message': '물건 정보가 성공적으로 저장되었습니다!', 'item_id': item_id}), 201
 
-@app.route('/api/my_lost_items', methods=['GET'])
+@api_bp.route('/api/my_lost_items', methods=['GET'])
 @token_required
 def get_my_lost_items(current_user):
-    items = LostItem.query.filter_by(user_id=current_user.id).all()
-    return jsonify({'lost_items': [item_to_dict(item) for item in items]}), 200
+    criteria = [LostItem.user_id == current_user.id]
 
-@app.route('/api/report_lost_item', methods=['POST'])
+    def build():
+        items = LostItem.query.filter(*criteria).all()
+        if include_archived_requested():
+            items += archived_items(ArchivedLostItem.user_id == current_user.id)
+        return {'lost_items': [item_to_dict(item) for item in items]}
+    return cached_listing(('my_lost_items', current_user.id), criteria, build)
+
+@api_bp.route('/api/report_lost_item', methods=['POST'])
 @token_required
+@inference_admission()
 def report_lost_item(current_user):
     logger.info("Received request for /api/report_lost_item")
     image_file = request.files.get('image')
@@ -339,42 +467,21 @@ def report_lost_item(current_user):
 
     if image_file and image_file.filename != '':
         filename = secure_filename(image_file.filename)
-        filepath = os.path.join(UPLOAD_DIRECTORY_PATH, filename)
+        filepath = os.path.join(get_upload_directory(), filename)
         image_url = f"/uploads/{filename}"
 
         try:
-            image_file.save(filepath)
-            logger.info(f"Report image saved to {filepath}")
-
-            if app.config['YOLO_MODEL']:
-                try:
-                    img = Image.open(filepath).convert('RGB')
-                    original_width, original_height = img.size
-
-                    processed_img_tensor = preprocess_image(img)
-                    if processed_img_tensor is None:
-                        raise ValueError("Image preprocessing failed.")
-                    
-                    results = app.config['YOLO_MODEL'](processed_img_tensor)
-                    
-                    if hasattr(results, 'xyxy') and results.xyxy is not None and len(results.xyxy) > 0:
-                        predictions_data = postprocess_detections(results, original_width, original_height)
-                        detection_results_json = json.dumps(predictions_data)
-                        logger.info(f"사용자 잃어버린 물건 - 이미지 감지 성공: {len(predictions_data)}개 객체 발견. Raw Detections: {predictions_data}")
-                        if not predictions_data: # 후처리 결과가 빈 경우
-                            detection_results_json = json.dumps([{"info": "이미지에서 감지된 물건이 없습니다."}])
-                    else:
-                        logger.info("YOLO 모델이 객체를 감지하지 못했거나 결과 형식이 예상과 다릅니다: /api/report_lost_item.")
-                        detection_results_json = json.dumps([{"info": "이미지에서 감지된 물건이 없습니다."}])
-
-                except Exception as yolo_e:
-                    logger.error(f"사용자 잃어버린 물건 감지 중 오류: {yolo_e}", exc_info=True)
-                    detection_results_json = json.dumps([{"error": f"YOLO 감지 처리 실패: {str(yolo_e)}"}])
-            else:
-                logger.warning("YOLO 모델이 로드되지 않아 사용자 잃어버린 물건 감지를 수행할 수 없습니다.")
-                detection_results_json = json.dumps([{"warning": "YOLO 모델이 백엔드에 로드되지 않았습니다."}])
+            save_upload(image_file, filepath)
+            logger.info("Report image saved to %s", filepath)
+
+            predictions_data = detect_objects_yolov5(filepath)
+            detection_results_json = json_dumps(predictions_data)
+            logger.info("사용자 잃어버린 물건 - 이미지 감지 완료: %d개 항목", len(predictions_data))
+            logger.debug("Raw Detections: %s", predictions_data)
+        except UploadRejected as e:
+            return jsonify({'error': e.message}), e.status_code
         except Exception as e:
-            logger.error(f"Error saving report image or processing: {e}", exc_info=True)
+            logger.error("Error saving report image or processing: %s", e, exc_info=True)
             return jsonify({'error': f'이미지 저장 또는 처리 중 오류 발생: {str(e)}'}), 500
 
     lost_date = None
@@ -382,196 +489,96 @@ def report_lost_item(current_user):
         try:
             lost_date = datetime.datetime.strptime(lost_date_str, '%Y-%m-%d')
         except ValueError:
-            logger.error(f"Invalid date format: {lost_date_str}")
+            logger.error("Invalid date format: %s", lost_date_str)
             return jsonify({'error': '유효하지 않은 날짜 형식입니다. YYYY-MM-DD 형식을 사용하세요.'}), 400
 
-    new_lost_report = LostReport(
-        user_id=current_user.id,
-        item_description=item_description,
-        lost_location=lost_location,
-        lost_date=lost_date,
-        image_url=image_url,
-        detection_results=detection_results_json
-    )
-    db.session.add(new_lost_report)
-    db.session.commit()
-    logger.info(f"New lost report created: {new_lost_report.id}. Detections: {detection_results_json}")
-
-    matched_items = []
-    all_found_items = LostItem.query.all()
-    logger.debug(f"Total {len(all_found_items)} found items in DB for matching.")
-
-    user_report_predictions = parse_predictions(new_lost_report.detection_results)
-    # 'info', 'error', 'warning' 메시지를 필터링하고 실제 레이블만 추출
-    user_report_labels = {p['label'] for p in user_report_predictions if 'label' in p}
-    logger.debug(f"User report labels for matching: {user_report_labels}")
-
-    for found_item in all_found_items:
-        score = 0
-        match_details = []
-        logger.debug(f"Matching against Found Item ID: {found_item.id}, Desc: {found_item.description}, Loc: {found_item.location}")
-
-        # 장소 일치
-        if new_lost_report.lost_location.lower() in found_item.location.lower() or \
-           found_item.location.lower() in new_lost_report.lost_location.lower():
-            score += 10
-            match_details.append("장소 일치")
-            logger.debug(f"  Location Match: score={score}")
-
-        # 설명 키워드 매칭
-        if query_matches(item_description, found_item.description):
-            score += 5
-            match_details.append("설명 키워드 매칭")
-            logger.debug(f"  Description Keyword Match: score={score}")
-
-        # AI 감지 특징 일치
-        found_item_predictions = parse_predictions(found_item.detection_results)
-        # my_backend_utils.postprocess_detections의 결과는 'label' 키를 사용합니다.
-        found_item_labels = {p['label'] for p in found_item_predictions if 'label' in p}
-        common_labels = user_report_labels.intersection(found_item_labels)
-        logger.debug(f"  Found item labels: {found_item_labels}, Common labels: {common_labels}")
-        if common_labels:
-            score += len(common_labels) * 10
-            match_details.append(f"AI 감지 특징 일치: {', '.join(common_labels)}")
-            logger.debug(f"  AI Detection Match: score={score}")
-
-        # 날짜 유사
-        if new_lost_report.lost_date and found_item.upload_date:
-            days_diff = abs((new_lost_report.lost_date - found_item.upload_date).days)
-            if days_diff <= 7:
-                score += (7 - days_diff) * 2 # 7일 이내면 점수 가산 (차이가 적을수록 높음)
-                match_details.append(f"날짜 유사 (차이: {days_diff}일)")
-                logger.debug(f"  Date Proximity Match ({days_diff} days): score={score}")
-        
-        logger.debug(f"  Final score for item {found_item.id}: {score}")
-        if score >= 10: # 최소 매칭 점수
-            matched_items.append({
-                "item": item_to_dict(found_item),
-                "match_score": score,
-                "match_details": match_details
-            })
+    user_id = current_user.id
 
+    def insert_report(session):
+        report = LostReport(
+            user_id=user_id,
+            item_description=item_description,
+            lost_location=lost_location,
+            lost_date=lost_date,
+            image_url=image_url,
+            detection_results=detection_results_json
+        )
+        session.add(report)
+        session.flush()
+        return report.id
+    report_id = run_write(insert_report)
+    # 쓰기 스레드의 세션에서 커밋된 객체이므로 현재 세션으로 다시 불러옵니다.
+    new_lost_report = LostReport.query.get(report_id)
+    logger.info("New lost report created: %s", new_lost_report.id)
+    logger.debug("Detections for lost report %s: %s", new_lost_report.id, detection_results_json)
+
+    # 지역 파티션(신고 지역 + 이웃 지역)의 매처 프로세스들에서 병렬로 점수를 매기고 상위 결과를 합칩니다.
+    # 기본적으로 매칭 대상(active)인 hot 행만 비교하고, include_archived면 보관된 물건도 함께 비교합니다.
+    query = make_query(lost_location, item_description, new_lost_report.detection_results, new_lost_report.lost_date)
+    archived = {}
+    if include_archived_requested():
+        with prefer_replica(db.session):
+            archived = {item.id: item for item in archived_items()}
+    # 신고는 이미 커밋되었으므로 매칭이 실패해도 500 대신 빈(또는 일부) 매칭 결과로 응답합니다.
+    # (500을 받은 클라이언트가 다시 보내 같은 신고가 중복 등록되지 않도록)
+    try:
+        matches, matching_complete = find_matches(query, lost_location,
+                                                  [make_candidate(item) for item in archived.values()])
+    except Exception as e:
+        logger.error("Matching failed for report %s: %s", new_lost_report.id, e, exc_info=True)
+        matches, matching_complete = [], False
+
+    # 매칭 후보는 복제 지연이 있어도 되므로 방금 쓴 직후여도 복제본에서 읽습니다.
+    with prefer_replica(db.session):
+        found_items = dict(archived)
+        found_items.update((item.id, item) for item in LostItem.query.filter(
+            LostItem.id.in_([item_id for _, item_id, _ in matches])).all())
+
+    matched_items = [{
+        "item": item_to_dict(found_items[item_id]),
+        "match_score": score,
+        "match_details": match_details
+    } for score, item_id, match_details in matches if item_id in found_items]
     matched_items.sort(key=lambda x: x['match_score'], reverse=True)
-    logger.info(f"Matching complete. Found {len(matched_items)} potential matches.")
+    for matched in matched_items:
+        sampled_log(logger, logging.DEBUG, "Match for report %s: item %s score %s details %s",
+                    new_lost_report.id, matched['item']['id'], matched['match_score'], matched['match_details'])
+    logger.info("Matching complete. Found %d potential matches.", len(matched_items))
 
     return jsonify({
         'message': '물건 등록 성공 및 매칭 결과',
         'lost_report': lost_report_to_dict(new_lost_report),
-        'matched_items': matched_items
+        'matched_items': matched_items,
+        'matching_complete': matching_complete
     }), 201
 
-def query_matches(query_text, target_text):
-    if not query_text or not target_text:
-        return False
-    query_words = set(query_text.lower().split())
-    target_words = set(target_text.lower().split())
-    return bool(query_words.intersection(target_words))
+@api_bp.app_errorhandler(RequestEntityTooLarge)
+def handle_request_too_large(e):
+    # 본문 크기 한도(MAX_CONTENT_LENGTH 또는 라우트별 한도)를 넘는 요청은 본문을 받기 전에 거절됩니다. (아래 500 핸들러보다 우선)
+    max_mb = (request.max_content_length or 0) // (1024 * 1024)
+    return jsonify({"error": f"요청 크기는 {max_mb}MB를 넘을 수 없습니다."}), 413
 
-@app.errorhandler(Exception)
+@api_bp.app_errorhandler(Exception)
 def handle_exception(e):
     import traceback
-    logger.error(f"서버 내부 오류 발생: {e}", exc_info=True)
+    logger.error("서버 내부 오류 발생: %s", e, exc_info=True)
     return jsonify({"error": f"서버 내부 오류: {str(e)}"}), 500
 
-@app.after_request
+@api_bp.after_app_request
 def add_security_headers(response):
     response.headers['X-Content-Type-Options'] = 'nosniff'
     response.headers['X-Frame-Options'] = 'DENY'
     response.headers['Content-Security-Policy'] = "default-src 'self'; img-src 'self' data: http://localhost:5000 http://localhost:3000; script-src 'self' 'unsafe-inline'; style-src 'self' 'unsafe-inline'"
     return response
 
-@app.route('/api/auth/login', methods=['POST'])
-def login():
-    data = request.get_json()
-    username = data.get('username')
-    password = data.get('password')
-    user = User.query.filter_by(username=username).first()
-    if user and user.verify_password(password): # User 모델에 verify_password 메서드 존재 가정
-        access_token = generate_token(user)
-
-        return jsonify({
-            "message": "로그인 성공",
-            "token": access_token,
-            "user": user.to_dict() # user.to_dict() 메서드가 User 모델에 정의되어 있어야 함
-        }), 200
-    else:
-        return jsonify({"error": "아이디 또는 비밀번호가 올바르지 않습니다."}), 401
-
-# ====================================================================
-
-# 이미지 특징 추출 모델 (ResNet50 사용 예시)
-feature_extractor = None
-try:
-    feature_extractor = models.resnet50(pretrained=True)
-    feature_extractor.eval()
-    logger.info("ResNet50 feature extractor loaded successfully.")
-except Exception as e:
-    logger.error(f"Error loading feature extractor (ResNet50): {e}", exc_info=True)
-    feature_extractor = None
-
-# 이미지 전처리 파이프라인
-preprocess = transforms.Compose([
-    transforms.Resize(256),
-    transforms.CenterCrop(224),
-    transforms.ToTensor(),
-    transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-])
-
-# 이미지 특징 추출 함수 정의
-def extract_features(image_path):
-    if feature_extractor is None:
-        logger.error("Feature extractor not loaded. Cannot extract features.")
-        return None
-    try:
-        image = Image.open(image_path).convert("RGB")
-        image_tensor = preprocess(image)
-        image_tensor = image_tensor.unsqueeze(0)  # 배치 차원 추가
-
-        with torch.no_grad():
-            original_fc = feature_extractor.fc
-            feature_extractor.fc = torch.nn.Identity()
-            features = feature_extractor(image_tensor)
-            feature_extractor.fc = original_fc
-
-        return features.squeeze().numpy()
-    except Exception as e:
-        logger.error(f"Error extracting features from {image_path}: {e}", exc_info=True)
-        return None
-
-# 코사인 유사성 계산 함수
-def calculate_similarity(vec1, vec2):
-    if vec1 is None or vec2 is None:
-        return 0.0
-    vec1 = vec1.reshape(1, -1)
-    vec2 = vec2.reshape(1, -1)
-    return cosine_similarity(vec1, vec2)[0][0]
-
-# ====================================================================
-# YOLOv5 객체 감지 함수 정의
-def detect_objects_yolov5(image_path):
-    if model is None:
-        logger.error("YOLOv5 model not loaded. Cannot perform object detection.")
-        return ["AI 감지 모델 로드 실패"]
-    try:
-        img = Image.open(image_path).convert("RGB")
-        results = model(img)
-        detections = results.pandas().xyxy[0]
-        labels = detections['name'].tolist()
-        if not labels:
-            return ["알 수 없음"]
-        return list(set(labels))
-    except Exception as e:
-        logger.error(f"Error detecting objects with YOLOv5 from {image_path}: {e}", exc_info=True)
-        return ["AI 감지 오류"]
-
 # ====================================================================
 
 # ... (DB 생성, 라우트 등) ...
 
 # 관리자 - 잃어버린 물건 이미지 등록 라우트
-@app.route('/api/admin/upload_lost_item', methods=['POST'])
-@token_required
+@api_bp.route('/api/admin/upload_lost_item', methods=['POST'])
 @admin_required
+@inference_admission(degradable=True)
 def upload_lost_item(current_user):
     if not current_user.is_admin:
         return jsonify({"error": "관리자 권한이 없습니다."}), 403
@@ -586,45 +593,67 @@ def upload_lost_item(current_user):
     if file and allowed_file(file.filename):
         try:
             filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
+            filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+            save_upload(file, filepath)
 
             description = request.form.get('description')
             location = request.form.get('location')
 
-            # 이미지 특징 벡터 추출
-            feature_vector = extract_features(filepath)
-            if feature_vector is None:
-                logger.error(f"Failed to extract features for {filepath}")
-                return jsonify({"error": "이미지 특징 추출에 실패했습니다."}), 500
-
-            # YOLOv5 객체 감지
-            detection_results = detect_objects_yolov5(filepath)
-            logger.debug(f"YOLOv5 detection results for admin upload: {detection_results}")
-
-            new_item = LostItem(
+            image_hash = compute_file_hash(filepath)
+            duplicate, duplicate_distance = find_duplicate(image_hash)
+            reused_item = duplicate if duplicate is not None and duplicate.feature_vector is not None \
+                and skip_duplicate_inference() else None
+            if reused_item is not None:
+                # 근접 중복 이미지는 기존 특징 벡터와 감지 결과를 재사용합니다.
+                logger.info("Near-duplicate of item %s (distance %s), skipping inference.", duplicate.id, duplicate_distance)
+                feature_vector = duplicate.feature_vector
+                detection_results = parse_predictions(duplicate.detection_results)
+            elif is_degraded():
+                # 추론 부하가 높은 축소 모드: 감지만 수행하고 특징 벡터 추출은 건너뜁니다.
+                feature_vector = None
+                detection_results = detect_objects_yolov5(filepath)
+            else:
+                # 이미지 특징 벡터 추출
+                feature_vector = extract_features(filepath)
+                if feature_vector is None:
+                    logger.error("Failed to extract features for %s", filepath)
+                    return jsonify({"error": "이미지 특징 추출에 실패했습니다."}), 500
+
+                # YOLOv5 객체 감지
+                detection_results = detect_objects_yolov5(filepath)
+            logger.debug("YOLOv5 detection results for admin upload: %s", detection_results)
+
+            object_features = collect_object_features(filepath, detection_results, reused_item)
+            fields = dict(
                 description=description,
                 location=location,
                 image_url=filename,
                 user_id=current_user.id,
-                feature_vector=feature_vector.tolist() if hasattr(feature_vector, 'tolist') else feature_vector,
-                detection_results=json.dumps(detection_results)
+                detection_results=json_dumps(detection_results),
+                phash=image_hash
             )
-            db.session.add(new_item)
-            db.session.commit()
+            # JSON 컬럼에 None을 넣으면 JSON 'null'이 저장되므로, 벡터가 없으면 키를 빼서 SQL NULL로 남깁니다.
+            if feature_vector is not None:
+                fields['feature_vector'] = feature_vector
+            item_id = run_write(insert_lost_item_job(fields, object_features))
 
             return jsonify({
                 "message": "이미지 등록 성공!",
-                "detection_results": detection_results or "알 수 없음",
-                "item_id": new_item.id
+                "detection_results": detection_results,
+                "item_id": item_id,
+                "duplicate_of": duplicate_summary(duplicate, duplicate_distance)
             }), 201
 
+        except UploadRejected as e:
+            return jsonify({"error": e.message}), e.status_code
         except Exception as e:
-            logger.error(f"관리자 이미지 등록 중 서버 내부 오류: {e}", exc_info=True)
+            logger.error("관리자 이미지 등록 중 서버 내부 오류: %s", e, exc_info=True)
             db.session.rollback()
             return jsonify({"error": f"서버 내부 오류: {str(e)}"}), 500
     else:
         return jsonify({"error": "허용되지 않는 파일 형식입니다."}), 400
 
+app = create_app()
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -5,9 +5,11 @@ import jwt
 import re
 import logging
 from functools import wraps
-from flask import Blueprint, request, jsonify, current_app
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, request, jsonify, current_app, g
 from .my_models import db, User
+from .database import run_write
+from .passwords import (PasswordPoolBusy, hash_password, needs_rehash, busy_response,
+                        login_blocked, record_login_failure, record_login_success, blocked_response)
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 ADMIN_SECRET_CODE = os.environ.get('ADMIN_CODE', 'B2Z8$KD56%TY89&')
@@ -37,6 +39,8 @@ def token_required(f):
         
         try:
             data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
+            # read-your-writes 구간 판단용 (이 사용자가 최근에 썼으면 사용자 조회도 primary에서)
+            g.user_id = data['user_id']
             current_user = User.query.get(data['user_id'])
             if not current_user:
                 return jsonify({'message': '유효하지 않은 토큰입니다: 사용자 없음'}), 401
@@ -45,7 +49,7 @@ def token_required(f):
         except jwt.InvalidTokenError:
             return jsonify({'message': '유효하지 않은 토큰입니다.'}), 401
         except Exception as e:
-            current_app.logger.error(f"토큰 처리 중 예외 발생: {e}", exc_info=True)
+            current_app.logger.error("토큰 처리 중 예외 발생: %s", e, exc_info=True)
             return jsonify({'message': '토큰 처리 중 오류가 발생했습니다.'}), 401
 
         return f(current_user, *args, **kwargs)
@@ -99,7 +103,8 @@ def register():
         if admin_code and not is_admin:
             return jsonify({'error': '유효하지 않은 관리자 코드입니다.'}), 403
 
-        user = User(username=username, password=password, email=email, is_admin=is_admin)
+        user = User(username=username, email=email, is_admin=is_admin)
+        user.set_password(password)
         db.session.add(user)
         db.session.commit()
         return jsonify({
@@ -111,15 +116,40 @@ def register():
                 'is_admin': user.is_admin
             }
         }), 201
+    except PasswordPoolBusy:
+        db.session.rollback()
+        return busy_response()
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'회원가입 중 오류가 발생했습니다: {str(e)}'}), 500
 
+def _rehash_password(user_id, password):
+    """해시 방식/비용 설정이 바뀐 사용자의 해시를 로그인에 성공한 비밀번호로 다시 만듭니다."""
+    new_hash = hash_password(password)
+    run_write(lambda session: session.query(User).filter_by(id=user_id).update({'password_hash': new_hash}))
+    logger.info("Rehashed password for user %s with %s", user_id, current_app.config['PASSWORD_HASH_METHOD'])
+
 def login_common(username, password, admin_code=None, is_admin_route=False):
-    user = User.query.filter_by(username=username).first()
+    remote_addr = request.remote_addr
+    retry_after = login_blocked(username, remote_addr)
+    if retry_after:
+        return blocked_response(retry_after)
 
-    if not user or not user.verify_password(password):
+    user = User.query.filter_by(username=username).first()
+    try:
+        verified = user is not None and user.verify_password(password)
+    except PasswordPoolBusy:
+        return busy_response()
+    if not verified:
+        record_login_failure(username, remote_addr)
         return jsonify({'error': '아이디 또는 비밀번호가 올바르지 않습니다.'}), 401
+    record_login_success(username)
+
+    if needs_rehash(user.password_hash):
+        try:
+            _rehash_password(user.id, password)
+        except Exception as e:  # 로그인 자체는 성공이므로 다음 로그인 때 다시 시도
+            logger.warning("Password rehash failed for user %s: %s", user.id, e)
 
     if is_admin_route:
         if not user.is_admin:
@@ -0,0 +1,443 @@
+# bulk_ingest.py
+# HTTP 일괄 등록은 파일 저장까지만 요청 안에서 하고, 추론/DB 등록은 백그라운드 작업으로 실행합니다.
+# (작업 상태는 BULK_JOB_DIR의 JSON 파일로 남겨 어느 워커 프로세스에서든 조회할 수 있습니다)
+import os
+import re
+import json
+import uuid
+import time
+import zipfile
+import logging
+import threading
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import click
+from flask import Blueprint, request, jsonify, current_app
+from flask.cli import with_appcontext
+from werkzeug.utils import secure_filename
+
+from .my_models import db, User, LostItem, ObjectEmbedding
+from .auth import admin_required
+from .admission import background_host_slot
+from .my_backend_utils import allowed_file, get_upload_directory
+from .object_search import object_embedding_rows
+from .upload_guard import UploadRejected, copy_limited, inspect_file, allow_request_body
+from .json_provider import dumps as json_dumps
+
+bulk_bp = Blueprint('bulk', __name__, url_prefix='/api/admin')
+logger = logging.getLogger(__name__)
+
+# ====================================================================
+# 워커 프로세스 (모델은 워커마다 한 번만 로드)
+_worker_models = {}
+
+def _init_worker(num_threads):
+    from .inference import load_detection_model, load_embedding_model, configure_inference_concurrency
+
+    # 워커 수 x 스레드 수가 코어 수를 넘지 않도록 제한 (워커 안에서는 배치를 하나씩 처리)
+    configure_inference_concurrency(1, num_threads)
+    _worker_models['yolo'] = load_detection_model()
+    _worker_models['resnet'] = load_embedding_model()
+
+def _process_batch(paths):
+    """워커 프로세스에서 이미지 묶음을 디코딩한 뒤 감지/임베딩을 한 번의 forward pass로 수행합니다."""
+    from .upload_guard import open_image
+    from .inference import detect_batch, extract_features_batch, extract_object_features_batch
+    from .image_hash import phash, hash_to_hex
+
+    results = []
+    images, decoded_paths = [], []
+    for path in paths:
+        try:
+            images.append(open_image(path))
+            decoded_paths.append(path)
+        except Exception as e:
+            results.append({'path': path, 'error': f'이미지 디코딩 실패: {e}'})
+
+    if not images:
+        return results
+
+    yolo_model = _worker_models.get('yolo')
+    extractor = _worker_models.get('resnet')
+    if extractor is None:
+        results.extend({'path': p, 'error': '이미지 특징 추출 모델이 로드되지 않았습니다.'} for p in decoded_paths)
+        return results
+
+    try:
+        features = extract_features_batch(extractor, images)
+        if yolo_model is not None:
+            detections = detect_batch(yolo_model, images)
+            # 모든 이미지의 객체 크롭도 한 번의 forward pass로 임베딩
+            object_features = extract_object_features_batch(extractor, images, detections)
+        else:
+            detections = [[{"warning": "YOLO 모델이 백엔드에 로드되지 않았습니다."}]] * len(images)
+            object_features = [[] for _ in images]
+    except Exception as e:
+        results.extend({'path': p, 'error': f'추론 실패: {e}'} for p in decoded_paths)
+        return results
+
+    for path, image, feature_vector, detection_results, objects in zip(
+            decoded_paths, images, features, detections, object_features):
+        results.append({
+            'path': path,
+            'phash': hash_to_hex(phash(image)),
+            'feature_vector': feature_vector.tolist(),
+            'detection_results': detection_results or [{"info": "이미지에서 감지된 물건이 없습니다."}],
+            'objects': [(detection, vector.tolist()) for detection, vector in objects],
+        })
+    return results
+
+# ====================================================================
+# 파일 저장 및 일괄 등록
+
+def save_upload_stream(stream, original_name, upload_dir):
+    """
+    스트림을 청크 단위로 업로드 폴더에 복사합니다. 이름 충돌을 피하기 위해 접두어를 붙입니다.
+    복사 중 크기 제한을 넘거나 저장된 파일의 헤더 검사에 실패하면 파일을 지우고 UploadRejected를 올립니다.
+    """
+    filename = f"{uuid.uuid4().hex[:8]}_{secure_filename(os.path.basename(original_name))}"
+    filepath = os.path.join(upload_dir, filename)
+    try:
+        with open(filepath, 'wb') as out:
+            copy_limited(stream, out)
+        inspect_file(filepath)
+    except Exception:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        raise
+    return filename, filepath
+
+def iter_zip_entries(zip_source):
+    """zip 아카이브의 이미지 항목을 (이름, 스트림 열기 함수)로 하나씩 돌려줍니다."""
+    with zipfile.ZipFile(zip_source) as archive:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            yield info.filename, (lambda info=info: archive.open(info))
+
+def _remove_file(path):
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(path)
+
+def create_worker_pool(workers):
+    """모델을 워커마다 한 번 로드하는 추론 프로세스 풀"""
+    num_threads = max(1, (os.cpu_count() or 1) // workers)
+    # torch가 로드된 부모 프로세스를 fork하면 OpenMP 스레드가 교착될 수 있으므로 spawn을 사용합니다.
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=_init_worker, initargs=(num_threads,))
+
+def ingest_images(entries, user_id, workers=None, batch_size=None, commit_size=None, progress=None, pool=None):
+    """
+    저장된 이미지들을 프로세스 풀에서 배치 단위로 감지/임베딩하고
+    bulk_insert_mappings로 commit_size개씩 나누어 LostItem에 등록합니다.
+    추론이나 DB 저장에 실패한 항목의 저장 파일은 지웁니다.
+
+    entries: {'path', 'filename', 'original_name', 'description', 'location'} 딕셔너리 목록
+    progress: (처리 완료 수, 전체 수, 오류 수)를 받는 콜백 (선택)
+    pool: 재사용할 추론 프로세스 풀 (없으면 workers개짜리 풀을 만들고 끝나면 닫음)
+    """
+    workers = workers or current_app.config['BULK_INGEST_WORKERS']
+    batch_size = batch_size or current_app.config['BULK_INGEST_BATCH_SIZE']
+    commit_size = commit_size or current_app.config['BULK_INGEST_COMMIT_SIZE']
+
+    entries_by_path = {entry['path']: entry for entry in entries}
+    paths = list(entries_by_path)
+    batches = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+
+    summary = {'total': len(paths), 'inserted': 0, 'failed': 0, 'errors': []}
+    pending = []
+
+    def record_error(entry, message):
+        summary['failed'] += 1
+        summary['errors'].append({'file': entry['original_name'], 'error': message})
+        _remove_file(entry['path'])
+
+    def flush():
+        if not pending:
+            return
+        try:
+            rows = [row for row, _, _ in pending]
+            # 객체 임베딩 행에 필요한 LostItem id를 받아오기 위해 return_defaults 사용
+            db.session.bulk_insert_mappings(LostItem, rows, return_defaults=True)
+            object_rows = []
+            for row, _, objects in pending:
+                object_rows.extend(object_embedding_rows(row['id'], objects))
+            if object_rows:
+                db.session.bulk_insert_mappings(ObjectEmbedding, object_rows)
+            db.session.commit()
+            summary['inserted'] += len(pending)
+        except Exception as e:
+            db.session.rollback()
+            logger.error("일괄 등록 중 DB 오류: %s", e, exc_info=True)
+            for _, entry, _ in pending:
+                record_error(entry, f'DB 저장 실패: {e}')
+        pending.clear()
+
+    done = 0
+    with (contextlib.nullcontext(pool) if pool is not None else create_worker_pool(workers)) as pool:
+        futures = {pool.submit(_process_batch, batch): batch for batch in batches}
+        for future in as_completed(futures):
+            try:
+                batch_results = future.result()
+            except Exception as e:
+                logger.error("일괄 처리 워커 오류: %s", e, exc_info=True)
+                batch_results = [{'path': p, 'error': f'워커 오류: {e}'} for p in futures[future]]
+
+            for result in batch_results:
+                entry = entries_by_path[result['path']]
+                if 'error' in result:
+                    record_error(entry, result['error'])
+                    continue
+                pending.append(({
+                    'user_id': user_id,
+                    'image_url': f"/uploads/{entry['filename']}",
+                    'description': entry['description'],
+                    'location': entry['location'],
+                    'detection_results': json_dumps(result['detection_results']),
+                    'feature_vector': result['feature_vector'],
+                    'phash': result['phash'],
+                }, entry, result['objects']))
+
+            if len(pending) >= commit_size:
+                flush()
+
+            done += len(futures[future])
+            if progress:
+                progress(done, summary['total'], summary['failed'])
+    flush()
+
+    logger.info("일괄 등록 완료: 전체 %d건, 성공 %d건, 실패 %d건",
+                summary['total'], summary['inserted'], summary['failed'])
+    return summary
+
+def collect_entries(sources, metadata, default_description, default_location, upload_dir):
+    """
+    (원본 이름, 스트림 열기 함수) 목록을 업로드 폴더에 저장하고 등록 항목과 사전 오류 목록을 반환합니다.
+    """
+    entries, errors = [], []
+    for original_name, open_stream in sources:
+        if not allowed_file(original_name):
+            errors.append({'file': original_name, 'error': '허용되지 않는 파일 형식입니다.'})
+            continue
+        meta = metadata.get(os.path.basename(original_name), {})
+        description = meta.get('description') or default_description
+        location = meta.get('location') or default_location
+        if not description or not location:
+            errors.append({'file': original_name, 'error': '설명과 장소가 필요합니다.'})
+            continue
+        try:
+            with open_stream() as stream:
+                filename, filepath = save_upload_stream(stream, original_name, upload_dir)
+        except UploadRejected as e:
+            errors.append({'file': original_name, 'error': e.message})
+            continue
+        except Exception as e:
+            errors.append({'file': original_name, 'error': f'파일 저장 실패: {e}'})
+            continue
+        entries.append({
+            'path': filepath,
+            'filename': filename,
+            'original_name': original_name,
+            'description': description,
+            'location': location,
+        })
+    return entries, errors
+
+def _merge_errors(summary, pre_errors):
+    summary['total'] += len(pre_errors)
+    summary['failed'] += len(pre_errors)
+    summary['errors'] = pre_errors + summary['errors']
+    return summary
+
+# ====================================================================
+# HTTP 일괄 등록 백그라운드 작업
+# 작업은 프로세스당 스레드 하나에서 차례로 실행하고, 추론 프로세스 풀은 작업 간에 재사용합니다.
+_job_runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix='bulk-job')
+_job_slots = None
+_shared_pool = None
+_state_lock = threading.Lock()
+
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+def _job_path(job_dir, job_id):
+    return os.path.join(job_dir, f'{job_id}.json')
+
+def write_job_status(job_dir, job_id, status):
+    """작업 상태를 임시 파일에 쓴 뒤 교체해, 조회 중에 반쯤 쓰인 파일이 읽히지 않게 합니다."""
+    os.makedirs(job_dir, exist_ok=True)
+    tmp_path = f'{_job_path(job_dir, job_id)}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(json_dumps(status))
+    os.replace(tmp_path, _job_path(job_dir, job_id))
+
+def _initial_status(job_id, entries, pre_errors):
+    return {'id': job_id, 'state': 'queued', 'total': len(entries) + len(pre_errors),
+            'done': 0, 'failed': len(pre_errors), 'created_at': time.time()}
+
+def _acquire_job_slot(max_pending):
+    global _job_slots
+    with _state_lock:
+        if _job_slots is None:
+            _job_slots = threading.BoundedSemaphore(max_pending)
+    return _job_slots.acquire(blocking=False)
+
+def _get_shared_pool(workers):
+    """작업 간에 재사용하는 추론 프로세스 풀 (워커가 죽어 풀이 깨졌으면 새로 만듦)"""
+    global _shared_pool
+    with _state_lock:
+        if _shared_pool is None or getattr(_shared_pool, '_broken', False):
+            if _shared_pool is not None:
+                _shared_pool.shutdown(wait=False, cancel_futures=True)
+            _shared_pool = create_worker_pool(workers)
+        return _shared_pool
+
+def _run_bulk_job(app, job_id, entries, pre_errors, user_id):
+    with app.app_context():
+        job_dir = app.config['BULK_JOB_DIR']
+        status = _initial_status(job_id, entries, pre_errors)
+        try:
+            # 요청 추론과 합쳐 호스트 전체 동시 추론 수가 ADMISSION_HOST_LIMIT을 넘지 않도록 슬롯을 잡고 실행
+            with background_host_slot(app):
+                status['state'] = 'running'
+                write_job_status(job_dir, job_id, status)
+
+                def report(done, total, failed):
+                    status['done'], status['failed'] = done, failed + len(pre_errors)
+                    write_job_status(job_dir, job_id, status)
+                    logger.info("일괄 등록 진행(%s): %d/%d (실패 %d)", job_id, done, total, failed)
+
+                # 풀이 깨져 있으면 submit이 바로 실패하고(등록 전), 다음 작업에서 새 풀을 만듭니다.
+                pool = _get_shared_pool(app.config['BULK_HTTP_WORKERS'])
+                summary = ingest_images(entries, user_id, progress=report, pool=pool)
+            status.update(_merge_errors(summary, pre_errors), state='finished', done=summary['total'])
+        except Exception as e:
+            # ingest_images는 배치/DB 오류를 항목별로 처리하므로 여기까지 오면 등록된 항목이 없습니다.
+            logger.error("일괄 등록 작업 %s 실패: %s", job_id, e, exc_info=True)
+            for entry in entries:
+                _remove_file(entry['path'])
+            status.update(state='failed', error=str(e))
+        finally:
+            status['finished_at'] = time.time()
+            write_job_status(job_dir, job_id, status)
+            _job_slots.release()
+
+# ====================================================================
+# 관리자 - 일괄 등록 라우트 (multipart 여러 장 또는 zip 아카이브)
+@bulk_bp.route('/bulk_upload', methods=['POST'])
+@admin_required
+def bulk_upload(current_user):
+    """파일을 저장하고 백그라운드 작업을 시작한 뒤 202와 작업 id를 바로 반환합니다."""
+    # 여러 장/zip을 받으므로 이 라우트만 본문 한도를 BULK_MAX_CONTENT_LENGTH로 늘립니다.
+    allow_request_body(current_app.config['BULK_MAX_CONTENT_LENGTH'])
+    images = [f for f in request.files.getlist('images') if f and f.filename]
+    archive = request.files.get('archive')
+    if not images and not (archive and archive.filename):
+        return jsonify({'error': '이미지 파일(images) 또는 zip 아카이브(archive)가 필요합니다.'}), 400
+
+    try:
+        metadata = json.loads(request.form.get('metadata') or '{}')
+    except json.JSONDecodeError as e:
+        return jsonify({'error': f'metadata 형식이 올바르지 않습니다: {e}'}), 400
+    description = request.form.get('description')
+    location = request.form.get('location')
+
+    if not _acquire_job_slot(current_app.config['BULK_JOB_MAX_PENDING']):
+        response = jsonify({'error': '대기 중인 일괄 등록 작업이 많습니다. 잠시 후 다시 시도해주세요.'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+
+    upload_dir = get_upload_directory()
+    entries = []
+    try:
+        sources = [(f.filename, (lambda f=f: f.stream)) for f in images]
+        entries, pre_errors = collect_entries(sources, metadata, description, location, upload_dir)
+        if archive and archive.filename:
+            archive_entries, archive_errors = collect_entries(iter_zip_entries(archive.stream), metadata,
+                                                              description, location, upload_dir)
+            entries.extend(archive_entries)
+            pre_errors.extend(archive_errors)
+    except Exception as e:
+        _job_slots.release()
+        for entry in entries:
+            _remove_file(entry['path'])
+        if isinstance(e, zipfile.BadZipFile):
+            return jsonify({'error': '올바른 zip 파일이 아닙니다.'}), 400
+        raise
+
+    job_id = uuid.uuid4().hex
+    app = current_app._get_current_object()
+    write_job_status(app.config['BULK_JOB_DIR'], job_id, _initial_status(job_id, entries, pre_errors))
+    _job_runner.submit(_run_bulk_job, app, job_id, entries, pre_errors, current_user.id)
+    return jsonify({
+        'message': '일괄 등록 작업이 시작되었습니다.',
+        'job_id': job_id,
+        'status_url': f'/api/admin/bulk_upload/{job_id}',
+        'accepted': len(entries),
+        'rejected': pre_errors,
+    }), 202
+
+# 관리자 - 일괄 등록 작업 상태 조회
+@bulk_bp.route('/bulk_upload/<job_id>', methods=['GET'])
+@admin_required
+def bulk_upload_status(current_user, job_id):
+    if not JOB_ID_PATTERN.match(job_id):
+        return jsonify({'error': '작업을 찾을 수 없습니다.'}), 404
+    try:
+        with open(_job_path(current_app.config['BULK_JOB_DIR'], job_id), encoding='utf-8') as f:
+            status = json.load(f)
+    except FileNotFoundError:
+        return jsonify({'error': '작업을 찾을 수 없습니다.'}), 404
+    return jsonify(status), 200
+
+# ====================================================================
+# flask bulk-ingest CLI
+@click.command('bulk-ingest')
+@click.argument('source', type=click.Path(exists=True))
+@click.option('--admin', 'admin_username', required=True, help='등록자로 기록할 관리자 아이디')
+@click.option('--description', default=None, help='모든 이미지에 적용할 기본 설명')
+@click.option('--location', default=None, help='모든 이미지에 적용할 기본 장소')
+@click.option('--metadata', 'metadata_path', type=click.Path(exists=True), default=None,
+              help='파일명 -> {"description", "location"} 형식의 JSON 파일')
+@click.option('--workers', type=int, default=None, help='추론 워커 프로세스 수')
+@click.option('--batch-size', type=int, default=None, help='forward pass 한 번에 처리할 이미지 수')
+@with_appcontext
+def bulk_ingest_command(source, admin_username, description, location, metadata_path, workers, batch_size):
+    """디렉터리 또는 zip 파일의 이미지를 LostItem으로 일괄 등록합니다."""
+    admin = User.query.filter_by(username=admin_username).first()
+    if not admin or not admin.is_admin:
+        raise click.ClickException(f'관리자 계정을 찾을 수 없습니다: {admin_username}')
+
+    metadata = {}
+    if metadata_path:
+        with open(metadata_path, encoding='utf-8') as f:
+            metadata = json.load(f)
+
+    if os.path.isdir(source):
+        sources = []
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                sources.append((path, (lambda path=path: open(path, 'rb'))))
+    elif zipfile.is_zipfile(source):
+        sources = iter_zip_entries(source)
+    else:
+        raise click.ClickException('SOURCE는 디렉터리 또는 zip 파일이어야 합니다.')
+
+    upload_dir = get_upload_directory()
+    os.makedirs(upload_dir, exist_ok=True)
+    entries, pre_errors = collect_entries(sources, metadata, description, location, upload_dir)
+    click.echo(f'{len(entries)}개 파일 저장 완료, 사전 검사 실패 {len(pre_errors)}건')
+
+    def echo_progress(done, total, failed):
+        click.echo(f'\r진행: {done}/{total} (실패 {failed})', nl=False)
+
+    summary = ingest_images(entries, admin.id, workers=workers, batch_size=batch_size,
+                            progress=echo_progress) if entries else \
+        {'total': 0, 'inserted': 0, 'failed': 0, 'errors': []}
+    summary = _merge_errors(summary, pre_errors)
+    click.echo()
+    click.echo(f"완료: 전체 {summary['total']}건, 성공 {summary['inserted']}건, 실패 {summary['failed']}건")
+    for error in summary['errors']:
+        click.echo(f"  - {error['file']}: {error['error']}", err=True)
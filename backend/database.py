@@ -0,0 +1,170 @@
+# database.py
+# DB 엔진 설정과 쓰기 경로.
+# SQLite에서는 연결마다 WAL/busy_timeout/synchronous 등의 pragma를 설정하고, 업로드 라우트의 INSERT는
+# 프로세스당 하나의 쓰기 스레드(WriteQueue)가 모아서 한 트랜잭션으로 커밋(group commit)합니다.
+# (여러 gunicorn 워커가 동시에 쓰더라도 워커당 쓰기 트랜잭션이 하나로 줄어 'database is locked'를 피합니다.)
+# MySQL 등 서버 DB에서는 연결 풀 옵션을 설정하고, DATABASE_REPLICA_URL이 있으면 읽기를 복제본으로 보냅니다.
+import os
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+from flask import current_app
+from sqlalchemy import event
+
+from .my_models import db
+from .db_routing import REPLICA_BIND_KEY, mark_write
+from .json_provider import dumps as json_dumps
+
+logger = logging.getLogger(__name__)
+
+def is_sqlite(app):
+    return app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite')
+
+def configure_database(app):
+    """앱 설정에 DB 관련 기본값을 채웁니다. db.init_app 전에 호출합니다."""
+    app.config.setdefault('SQLITE_JOURNAL_MODE', os.getenv('SQLITE_JOURNAL_MODE', 'WAL'))
+    app.config.setdefault('SQLITE_BUSY_TIMEOUT_MS', int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000)))
+    app.config.setdefault('SQLITE_SYNCHRONOUS', os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'))
+    app.config.setdefault('SQLITE_MMAP_SIZE', int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)))
+    # 음수는 KiB 단위 (-65536 = 64MB)
+    app.config.setdefault('SQLITE_CACHE_SIZE', int(os.getenv('SQLITE_CACHE_SIZE', -65536)))
+    # 업로드 INSERT를 쓰기 스레드로 모을지 여부 (기본: SQLite일 때만)
+    app.config.setdefault('DB_WRITE_QUEUE', os.getenv('DB_WRITE_QUEUE', '1' if is_sqlite(app) else '0') == '1')
+    app.config.setdefault('DB_WRITE_BATCH_SIZE', int(os.getenv('DB_WRITE_BATCH_SIZE', 32)))
+    app.config.setdefault('DB_WRITE_BATCH_WAIT', float(os.getenv('DB_WRITE_BATCH_WAIT', 0.01)))
+    app.config.setdefault('DB_WRITE_TIMEOUT', float(os.getenv('DB_WRITE_TIMEOUT', 30)))
+
+    # 읽기 복제본과 read-your-writes 구간(초, 쓰기 후 이 시간 동안 해당 사용자의 읽기는 primary로)
+    app.config.setdefault('DATABASE_REPLICA_URL', os.getenv('DATABASE_REPLICA_URL'))
+    app.config.setdefault('DB_READ_YOUR_WRITES_SECONDS', float(os.getenv('DB_READ_YOUR_WRITES_SECONDS', 5)))
+
+    # SQLALCHEMY_ENGINE_OPTIONS는 primary와 replica 엔진에 모두 적용됩니다.
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    # JSON 컬럼도 API 응답과 같은 변환기로 직렬화합니다. (NumPy 특징 벡터를 .tolist() 없이 저장)
+    options.setdefault('json_serializer', json_dumps)
+    if is_sqlite(app):
+        # sqlite3 드라이버 자체의 잠금 대기 시간(초)도 busy_timeout과 맞춥니다.
+        options.setdefault('connect_args', {}).setdefault('timeout', app.config['SQLITE_BUSY_TIMEOUT_MS'] / 1000)
+    else:
+        options.setdefault('pool_size', int(os.getenv('DB_POOL_SIZE', 10)))
+        options.setdefault('max_overflow', int(os.getenv('DB_POOL_MAX_OVERFLOW', 20)))
+        options.setdefault('pool_timeout', float(os.getenv('DB_POOL_TIMEOUT', 30)))
+        # MySQL wait_timeout(기본 8시간)보다 먼저 연결을 교체하고, 꺼내기 전에 끊긴 연결인지 확인합니다.
+        options.setdefault('pool_recycle', int(os.getenv('DB_POOL_RECYCLE', 1800)))
+        options.setdefault('pool_pre_ping', os.getenv('DB_POOL_PRE_PING', '1') == '1')
+
+    if app.config['DATABASE_REPLICA_URL']:
+        app.config.setdefault('SQLALCHEMY_BINDS', {})[REPLICA_BIND_KEY] = app.config['DATABASE_REPLICA_URL']
+
+def init_database(app):
+    """db.init_app 이후에 호출합니다. SQLite 엔진에 연결별 pragma를 등록하고 쓰기 큐를 만듭니다."""
+    with app.app_context():
+        sqlite_engines = [engine for engine in db.engines.values() if engine.dialect.name == 'sqlite']
+    if sqlite_engines:
+        config = app.config
+        pragmas = [
+            f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}",
+            f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+            f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+            f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+            f"PRAGMA cache_size={int(config['SQLITE_CACHE_SIZE'])}",
+        ]
+
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for pragma in pragmas:
+                    cursor.execute(pragma)
+            finally:
+                cursor.close()
+
+        for engine in sqlite_engines:
+            event.listen(engine, 'connect', set_sqlite_pragmas)
+        logger.info("SQLite pragmas enabled: %s", ', '.join(pragmas))
+
+    app.extensions['write_queue'] = WriteQueue(
+        app, app.config['DB_WRITE_BATCH_SIZE'], app.config['DB_WRITE_BATCH_WAIT']
+    ) if app.config['DB_WRITE_QUEUE'] else None
+
+class WriteQueue:
+    """
+    쓰기 작업(session을 받아 행을 추가하고 결과를 반환하는 함수)을 받아 하나의 스레드에서 실행합니다.
+    대기 중인 작업을 최대 max_batch개까지 모아 한 번에 커밋하고, 그 묶음에서 실패한 작업이 있으면
+    묶음을 롤백한 뒤 작업마다 따로 다시 실행해 실패가 다른 요청에 영향을 주지 않도록 합니다.
+    """
+
+    def __init__(self, app, max_batch=32, max_wait=0.01):
+        self.app = app
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.jobs = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def submit(self, job):
+        """job을 큐에 넣고 결과를 받을 Future를 반환합니다."""
+        with self.lock:
+            # 스레드는 처음 쓰기 시점에 시작합니다. (gunicorn preload 후 fork된 워커에도 스레드가 생기도록)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+                self.thread.start()
+        future = Future()
+        self.jobs.put((job, future))
+        return future
+
+    def _next_batch(self):
+        batch = [self.jobs.get()]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self.jobs.get(timeout=self.max_wait))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            with self.app.app_context():
+                try:
+                    self._commit_batch(batch)
+                finally:
+                    db.session.remove()
+
+    def _commit_batch(self, batch):
+        try:
+            results = [job(db.session) for job, _ in batch]
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if len(batch) > 1:
+                logger.warning("Group commit of %d writes failed, retrying one by one: %s", len(batch), e)
+                for item in batch:
+                    self._commit_batch([item])
+            else:
+                batch[0][1].set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+        logger.debug("Group-committed %d writes", len(batch))
+
+def run_write(job, app=None):
+    """
+    쓰기 작업을 실행하고 결과를 반환합니다. 쓰기 큐가 켜져 있으면 쓰기 스레드에서 다른 요청의 쓰기와 함께
+    커밋될 때까지 기다리고, 꺼져 있으면 현재 요청의 세션에서 바로 실행해 커밋합니다.
+    """
+    app = app or current_app._get_current_object()
+    write_queue = app.extensions.get('write_queue')
+    if write_queue is None:
+        try:
+            result = job(db.session)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return result
+    result = write_queue.submit(job).result(timeout=app.config['DB_WRITE_TIMEOUT'])
+    # 쓰기 스레드의 세션에는 요청 사용자 정보가 없으므로 read-your-writes 구간은 여기서 기록합니다.
+    mark_write()
+    return result
@@ -0,0 +1,101 @@
+# db_routing.py
+# 읽기 전용 쿼리는 복제본(replica) 엔진으로, 쓰기(flush/INSERT/UPDATE/DELETE)는 기본(primary) 엔진으로 보내는 세션.
+# 복제본은 SQLALCHEMY_BINDS['replica']로 설정하며, 설정하지 않으면 모든 쿼리가 primary로 갑니다.
+# 최근에 쓴 사용자(또는 세션)는 DB_READ_YOUR_WRITES_SECONDS 동안 primary에서 읽어 복제 지연으로
+# 방금 쓴 데이터가 보이지 않는 일을 막습니다. (read-your-writes)
+import time
+import threading
+import contextlib
+from collections import OrderedDict
+
+from flask import current_app, g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql.dml import UpdateBase
+
+REPLICA_BIND_KEY = 'replica'
+
+# 사용자 id -> 마지막 쓰기 시각 (마지막 쓰기 순서로 유지해 앞쪽부터 만료된 항목을 지움)
+_last_write = OrderedDict()
+_last_write_lock = threading.Lock()
+
+def _writer_key():
+    # token_required가 g.user_id를 설정합니다. 인증 없는 요청/CLI/쓰기 스레드는 None입니다.
+    return g.get('user_id') if has_app_context() else None
+
+def mark_write():
+    """
+    현재 사용자의 마지막 쓰기 시각을 기록합니다. (프로세스 단위)
+    사용자가 없는 쓰기는 기록하지 않고, read-your-writes 구간이 지난 항목은 기록할 때 지웁니다.
+    """
+    key = _writer_key()
+    if key is None:
+        return
+    window = current_app.config.get('DB_READ_YOUR_WRITES_SECONDS', 0)
+    now = time.monotonic()
+    with _last_write_lock:
+        _last_write[key] = now
+        _last_write.move_to_end(key)
+        while _last_write:
+            oldest_key, last = next(iter(_last_write.items()))
+            if now - last < window:
+                break
+            del _last_write[oldest_key]
+
+def in_write_window(window):
+    key = _writer_key()
+    if key is None:
+        return False
+    last = _last_write.get(key)
+    return last is not None and time.monotonic() - last < window
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy 세션에 primary/replica 라우팅을 더한 세션"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._use_replica(clause):
+            replica = self._db.engines.get(REPLICA_BIND_KEY)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+    def _use_replica(self, clause):
+        if self._flushing or isinstance(clause, UpdateBase) or self.info.get('force_primary'):
+            return False
+        if self.new or self.dirty or self.deleted or self.info.get('wrote'):
+            return False
+        if self.info.get('force_replica'):
+            return True
+        return not in_write_window(current_app.config.get('DB_READ_YOUR_WRITES_SECONDS', 0))
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _record_flush(session, flush_context):
+    session.info['wrote'] = True
+    mark_write()
+
+@contextlib.contextmanager
+def prefer_replica(session):
+    """
+    블록 안의 읽기는 read-your-writes 구간이어도 복제본에서 읽습니다.
+    (매칭 후보처럼 약간 늦게 보여도 되는 대량 조회용)
+    """
+    previous = session.info.get('force_replica')
+    session.info['force_replica'] = True
+    try:
+        yield
+    finally:
+        session.info['force_replica'] = previous
+
+@contextlib.contextmanager
+def use_primary(session):
+    """
+    블록 안의 읽기를 모두 primary에서 합니다.
+    (읽은 행을 그대로 옮기거나 지우는 배치 작업처럼 복제 지연된 행을 읽으면 안 되는 경우.
+    bulk_insert_mappings/Query.delete는 after_flush를 거치지 않아 쓰기 기록만으로는 primary로 고정되지 않습니다.)
+    """
+    previous = session.info.get('force_primary')
+    session.info['force_primary'] = True
+    try:
+        yield
+    finally:
+        session.info['force_primary'] = previous
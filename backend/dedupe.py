@@ -0,0 +1,147 @@
+# dedupe.py
+import logging
+import threading
+
+from flask import Blueprint, request, jsonify, current_app
+
+from .my_models import db, LostItem
+from .auth import admin_required
+from .image_hash import BKTree, hex_to_hash
+
+dedupe_bp = Blueprint('dedupe', __name__, url_prefix='/api/admin')
+logger = logging.getLogger(__name__)
+
+class PHashIndex:
+    """
+    LostItem.phash의 프로세스 내 BK-tree 인덱스.
+    조회할 때마다 마지막으로 읽은 id 이후의 행만 DB에서 가져와 추가하고,
+    병합으로 삭제된 항목은 트리에서 빼는 대신 removed 집합으로 걸러냅니다.
+    """
+
+    def __init__(self):
+        self.tree = BKTree()
+        self.max_id = 0
+        self.removed = set()
+        self.lock = threading.Lock()
+
+    def sync(self):
+        with self.lock:
+            rows = db.session.query(LostItem.id, LostItem.phash) \
+                .filter(LostItem.id > self.max_id, LostItem.phash.isnot(None)) \
+                .order_by(LostItem.id).all()
+            for item_id, phash in rows:
+                self.tree.add(hex_to_hash(phash), item_id)
+                self.max_id = item_id
+
+    def search(self, phash, distance, sync=True):
+        """
+        phash(16진수 문자열)와 해밍 거리 distance 이내인 (항목 id, 거리) 목록.
+        여러 번 조회할 때는 sync()를 한 번 호출한 뒤 sync=False로 DB 조회를 생략합니다.
+        """
+        if sync:
+            self.sync()
+        return [(item_id, d) for item_id, d in self.tree.search(hex_to_hash(phash), distance)
+                if item_id not in self.removed]
+
+    def remove(self, item_ids):
+        with self.lock:
+            self.removed.update(item_ids)
+
+_index = PHashIndex()
+
+def get_phash_index():
+    return _index
+
+def find_duplicate(phash, distance=None):
+    """가장 가까운 기존 LostItem과 거리를 반환합니다. 없으면 (None, None)"""
+    if not phash:
+        return None, None
+    distance = current_app.config['DEDUP_DISTANCE'] if distance is None else distance
+    for item_id, d in _index.search(phash, distance):
+        item = LostItem.query.get(item_id)
+        if item is not None:
+            return item, d
+    return None, None
+
+def _item_summary(item):
+    return {
+        "id": item.id,
+        "imageUrl": item.image_url,
+        "description": item.description,
+        "location": item.location,
+        "phash": item.phash,
+    }
+
+# ====================================================================
+# 관리자 - 근접 중복 조회 및 병합
+@dedupe_bp.route('/duplicates', methods=['GET'])
+@admin_required
+def list_duplicates(current_user):
+    try:
+        distance = int(request.args.get('distance', current_app.config['DEDUP_DISTANCE']))
+    except ValueError:
+        return jsonify({'error': 'distance는 정수여야 합니다.'}), 400
+
+    # 요청당 한 번만 인덱스를 동기화하고, 목록에 필요한 열만 읽습니다. (feature_vector 등은 읽지 않음)
+    _index.sync()
+    items = db.session.query(LostItem.id, LostItem.image_url, LostItem.description, LostItem.location,
+                             LostItem.phash) \
+        .filter(LostItem.phash.isnot(None)).order_by(LostItem.id).all()
+    items_by_id = {item.id: item for item in items}
+
+    # 서로 거리 이내인 항목들을 union-find로 묶습니다.
+    parent = {}
+
+    def find(item_id):
+        while parent.get(item_id, item_id) != item_id:
+            item_id = parent[item_id]
+        return item_id
+
+    for item in items:
+        for other_id, _ in _index.search(item.phash, distance, sync=False):
+            if other_id != item.id and other_id in items_by_id:
+                root_a, root_b = find(item.id), find(other_id)
+                if root_a != root_b:
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    groups = {}
+    for item in items:
+        groups.setdefault(find(item.id), []).append(item)
+    duplicate_groups = [
+        {'keep_id': root, 'items': [_item_summary(item) for item in members]}
+        for root, members in groups.items() if len(members) > 1
+    ]
+    return jsonify({'distance': distance, 'groups': duplicate_groups}), 200
+
+@dedupe_bp.route('/duplicates/merge', methods=['POST'])
+@admin_required
+def merge_duplicates(current_user):
+    data = request.get_json() or {}
+    keep_id = data.get('keep_id')
+    duplicate_ids = [i for i in data.get('duplicate_ids', []) if i != keep_id]
+    if not keep_id or not duplicate_ids:
+        return jsonify({'error': 'keep_id와 duplicate_ids가 필요합니다.'}), 400
+
+    keep = LostItem.query.get(keep_id)
+    if keep is None:
+        return jsonify({'error': '남길 물건을 찾을 수 없습니다.'}), 404
+    duplicates = LostItem.query.filter(LostItem.id.in_(duplicate_ids)).all()
+
+    try:
+        for duplicate in duplicates:
+            # 남길 항목에 없는 추론 결과는 중복 항목에서 가져옵니다.
+            if keep.feature_vector is None and duplicate.feature_vector is not None:
+                keep.feature_vector = duplicate.feature_vector
+            if not keep.detection_results and duplicate.detection_results:
+                keep.detection_results = duplicate.detection_results
+            db.session.delete(duplicate)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error("중복 병합 중 오류: %s", e, exc_info=True)
+        return jsonify({'error': f'중복 병합 중 서버 오류: {str(e)}'}), 500
+
+    merged_ids = [duplicate.id for duplicate in duplicates]
+    _index.remove(merged_ids)
+    logger.info("Merged duplicates %s into item %s", merged_ids, keep_id)
+    return jsonify({'message': '중복 항목이 병합되었습니다.', 'keep_id': keep_id, 'merged_ids': merged_ids}), 200
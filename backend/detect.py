@@ -1,24 +1,93 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 from flask import Blueprint, request, jsonify, current_app
-import torch
-from PIL import Image
+from .auth import token_required
+from .admission import inference_admission
+from .upload_guard import UploadRejected, inspect_upload, open_image, allow_request_body, request_body_limit
+from . import inference
 
 detect_bp = Blueprint('detect', __name__, url_prefix='/api')
 
+# 이미지 디코딩용 스레드 풀 (PIL 디코딩은 GIL을 놓으므로 스레드로 병렬 처리됩니다)
+_decode_pool = ThreadPoolExecutor(max_workers=int(os.getenv('DETECT_DECODE_WORKERS', 4)),
+                                  thread_name_prefix='image-decode')
+
+def _decode_image(image_file):
+    inspect_upload(image_file)
+    return open_image(image_file.stream)
+
 @detect_bp.route('/yolo', methods=['POST'])
-def yolo_detect():
+@token_required
+@inference_admission()
+def yolo_detect(current_user):
     if 'image' not in request.files:
         return jsonify({'error': '이미지 파일이 필요합니다.'}), 400
 
+    # YOLOv5 모델 (프로세스 공용, 최초 1회만 로드)
+    model = inference.get_detection_model()
+    if model is None:
+        return jsonify({'error': 'YOLO 모델이 백엔드에 로드되지 않았습니다.'}), 503
+
     image_file = request.files['image']
-    image = Image.open(image_file.stream)
+    try:
+        inspect_upload(image_file)
+    except UploadRejected as e:
+        return jsonify({'error': e.message}), e.status_code
+    image = open_image(image_file.stream)
+    detections = inference.detect_batch(model, [image])[0]
+
+    return jsonify({'detections': detections}), 200
+
+@detect_bp.route('/yolo/batch', methods=['POST'])
+@token_required
+@inference_admission()
+def yolo_detect_batch(current_user):
+    """
+    여러 이미지(images 필드)를 한 요청으로 받아 디코딩은 스레드 풀에서 병렬로,
+    감지는 한 번의 배치 forward pass로 처리합니다. 결과는 업로드 순서대로 이미지별로 반환하며,
+    한 이미지의 오류가 다른 이미지의 결과에 영향을 주지 않습니다.
+    """
+    max_images = current_app.config['DETECT_BATCH_MAX_IMAGES']
+    allow_request_body(request_body_limit(max_images))
+    image_files = [f for f in request.files.getlist('images') if f and f.filename]
+    if not image_files:
+        return jsonify({'error': '이미지 파일(images)이 필요합니다.'}), 400
+    if len(image_files) > max_images:
+        return jsonify({'error': f'한 번에 최대 {max_images}장까지 요청할 수 있습니다.'}), 400
+
+    model = inference.get_detection_model()
+    if model is None:
+        return jsonify({'error': 'YOLO 모델이 백엔드에 로드되지 않았습니다.'}), 503
+
+    results = [{'index': i, 'filename': f.filename} for i, f in enumerate(image_files)]
+    futures = [_decode_pool.submit(_decode_image, f) for f in image_files]
+    images, image_indexes = [], []
+    for i, future in enumerate(futures):
+        try:
+            images.append(future.result())
+            image_indexes.append(i)
+        except UploadRejected as e:
+            results[i]['error'] = e.message
+        except Exception as e:
+            results[i]['error'] = f'이미지 디코딩 실패: {e}'
 
-    # YOLOv5 모델 로드 (최초 1회만)
-    if not hasattr(current_app, 'yolo_model'):
-        model_path = current_app.config.get('YOLO_MODEL_PATH', 'yolov5s.pt')
-        current_app.yolo_model = torch.hub.load('ultralytics/yolov5', 'custom', path=model_path)
+    if images:
+        try:
+            batch_detections = inference.detect_batch(model, images)
+        except Exception as e:
+            current_app.logger.error("배치 감지 실패, 이미지별로 다시 시도합니다: %s", e, exc_info=True)
+            batch_detections = []
+            for image in images:
+                try:
+                    batch_detections.append(inference.detect_batch(model, [image])[0])
+                except Exception as image_e:
+                    batch_detections.append(image_e)
 
-    model = current_app.yolo_model
-    results = model(image)
-    detections = results.pandas().xyxy[0].to_dict(orient='records')
+        for i, detections in zip(image_indexes, batch_detections):
+            if isinstance(detections, Exception):
+                results[i]['error'] = f'YOLO 감지 처리 실패: {detections}'
+            else:
+                results[i]['detections'] = detections
 
-    return jsonify({'detections': detections}), 200
\ No newline at end of file
+    return jsonify({'results': results}), 200
@@ -0,0 +1,367 @@
+# embedding_index.py
+# LostItem.feature_vector(2048차원 float, 약 8KB)를 PCA + product quantization(PQ)으로 압축한 메모리 인덱스.
+# - 학습(flask pq-train): 기존 임베딩 표본으로 PCA 행렬과 부분공간별 k-means 코드북을 학습해 파일로 저장
+# - 검색: 질의와 코드북 중심 사이의 거리표(ADC lookup table)를 만든 뒤 코드(기본 64바이트/벡터)만으로 전체를 스캔하고,
+#         상위 후보만 DB의 원본 벡터로 정확한 코사인 유사도를 다시 계산(re-ranking)합니다.
+# - 평가(flask pq-eval): 정확한 전수 검색 대비 recall@k와 메모리 사용량 비교
+import os
+import time
+import logging
+import threading
+
+import click
+import numpy as np
+from flask import Blueprint, request, jsonify
+from flask.cli import with_appcontext
+
+from .my_models import db, LostItem
+from .auth import token_required
+from .admission import inference_admission
+from .upload_guard import UploadRejected, inspect_upload, open_image
+from .db_routing import prefer_replica
+from .lifecycle import STATUS_ACTIVE
+from . import inference
+
+embedding_index_bp = Blueprint('embedding_index', __name__, url_prefix='/api')
+logger = logging.getLogger(__name__)
+
+PQ_MODEL_PATH = os.getenv('PQ_MODEL_PATH', os.path.join(inference.INFERENCE_CACHE_DIR, 'pq_model.npz'))
+PQ_DIM = int(os.getenv('PQ_DIM', 256))                # PCA 후 차원
+PQ_SUBSPACES = int(os.getenv('PQ_SUBSPACES', 64))     # 부분공간 수 = 벡터당 코드 바이트 수
+PQ_CENTROIDS = 256                                    # 부분공간별 중심 수 (코드 1바이트)
+PQ_RERANK = int(os.getenv('PQ_RERANK', 100))          # 원본 벡터로 다시 계산할 후보 수
+_LOAD_CHUNK = 1000
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+def _as_vector(vector, dim):
+    """JSON에서 읽은 벡터를 float32 배열로 바꿉니다. (None/JSON null, 차원이 다르거나 숫자가 아닌 값은 None)"""
+    if vector is None:
+        return None
+    try:
+        array = np.asarray(vector, dtype=np.float32)
+    except (TypeError, ValueError):
+        return None
+    return array if array.shape == (dim,) and np.isfinite(array).all() else None
+
+def _squared_distances(data, centroids):
+    return (np.einsum('ij,ij->i', data, data)[:, None] - 2 * data @ centroids.T
+            + np.einsum('ij,ij->i', centroids, centroids)[None, :])
+
+def _kmeans(data, k, iterations, rng):
+    """NumPy k-means (비어 버린 군집은 임의의 점으로 다시 시작)"""
+    centroids = data[rng.choice(len(data), size=k, replace=len(data) < k)].copy()
+    for _ in range(iterations):
+        assignment = _squared_distances(data, centroids).argmin(axis=1)
+        counts = np.bincount(assignment, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, data)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = data[rng.choice(len(data), size=int(empty.sum()))]
+    return centroids
+
+class PQCodec:
+    """L2 정규화 -> PCA 투영 -> 부분공간별 8비트 PQ 코드"""
+
+    def __init__(self, mean, components, codebooks):
+        self.mean = mean.astype(np.float32)              # (D,)
+        self.components = components.astype(np.float32)  # (D, dim)
+        self.codebooks = codebooks.astype(np.float32)    # (M, K, dim / M)
+
+    @property
+    def num_subspaces(self):
+        return self.codebooks.shape[0]
+
+    @classmethod
+    def train(cls, vectors, dim=PQ_DIM, num_subspaces=PQ_SUBSPACES, iterations=20, seed=0):
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        dim = min(dim, vectors.shape[1], len(vectors))
+        if dim % num_subspaces:
+            raise ValueError(f"PCA 차원({dim})은 부분공간 수({num_subspaces})로 나누어떨어져야 합니다.")
+        mean = vectors.mean(axis=0)
+        _, _, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+        components = vt[:dim].T
+        projected = (vectors - mean) @ components
+        rng = np.random.default_rng(seed)
+        sub_dim = dim // num_subspaces
+        codebooks = np.stack([
+            _kmeans(projected[:, m * sub_dim:(m + 1) * sub_dim], PQ_CENTROIDS, iterations, rng)
+            for m in range(num_subspaces)
+        ])
+        return cls(mean, components, codebooks)
+
+    def project(self, vectors):
+        return (_normalize(np.asarray(vectors, dtype=np.float32)) - self.mean) @ self.components
+
+    def _subvectors(self, projected):
+        return projected.reshape(len(projected), self.num_subspaces, -1)
+
+    def encode(self, vectors):
+        """(N, D) 벡터 -> (N, M) uint8 코드"""
+        subvectors = self._subvectors(self.project(vectors))
+        codes = np.empty(subvectors.shape[:2], dtype=np.uint8)
+        for m in range(self.num_subspaces):
+            codes[:, m] = _squared_distances(subvectors[:, m], self.codebooks[m]).argmin(axis=1)
+        return codes
+
+    def lookup_table(self, query):
+        """질의 하나의 부분공간별 중심까지 제곱 거리표 (M, K)"""
+        subvectors = self._subvectors(self.project(np.asarray(query, dtype=np.float32).reshape(1, -1)))[0]
+        return ((self.codebooks - subvectors[:, None, :]) ** 2).sum(axis=2)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, mean=self.mean, components=self.components, codebooks=self.codebooks)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['mean'], data['components'], data['codebooks'])
+
+class PQIndex:
+    """
+    active LostItem의 id와 PQ 코드 배열. 마지막으로 읽은 id 이후의 행만 DB에서 가져와 인코딩하고,
+    보관/병합/claimed로 빠진 물건은 sync 때 제거합니다.
+    (ids, codes)는 한 튜플로 통째로 바꾸므로 search는 잠금 없이 항상 길이가 맞는 한 쌍을 읽습니다.
+    벡터가 JSON null이거나 형식이 맞지 않는 행은 skipped에 두고 인덱싱하지 않습니다.
+    """
+
+    def __init__(self, codec):
+        self.codec = codec
+        self.entries = (np.empty(0, dtype=np.int64), np.empty((0, codec.num_subspaces), dtype=np.uint8))
+        self.max_id = 0
+        self.skipped = set()
+        self.lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        ids, codes = self.entries
+        return ids.nbytes + codes.nbytes
+
+    def add(self, ids, vectors):
+        self.add_codes(ids, self.codec.encode(vectors) if len(ids) else None)
+
+    def add_codes(self, ids, codes):
+        if not len(ids):
+            return
+        old_ids, old_codes = self.entries
+        self.entries = (np.concatenate([old_ids, np.asarray(ids, dtype=np.int64)]),
+                        np.concatenate([old_codes, codes]))
+
+    def keep_only(self, live_ids):
+        """live_ids에 없는 id의 코드를 제거합니다."""
+        ids, codes = self.entries
+        keep = np.isin(ids, np.fromiter(live_ids, dtype=np.int64))
+        if not keep.all():
+            self.entries = (ids[keep], codes[keep])
+
+    def sync(self):
+        indexed = (LostItem.status == STATUS_ACTIVE, LostItem.feature_vector.isnot(None))
+        with self.lock, prefer_replica(db.session):
+            rows = db.session.query(LostItem.id, LostItem.feature_vector) \
+                .filter(LostItem.id > self.max_id, *indexed).order_by(LostItem.id).yield_per(_LOAD_CHUNK)
+            # 원본 벡터는 청크 단위로만 메모리에 올리고 코드만 모아 둡니다.
+            # max_id는 인코딩에 성공한 청크까지만 올려, 실패한 청크는 다음 sync에서 다시 읽습니다.
+            new_ids, new_codes = [], []
+            last_id = self.max_id
+            chunk = []
+            try:
+                for row in rows:
+                    chunk.append(row)
+                    if len(chunk) >= _LOAD_CHUNK:
+                        last_id = self._encode_chunk(chunk, new_ids, new_codes)
+                        chunk = []
+                if chunk:
+                    last_id = self._encode_chunk(chunk, new_ids, new_codes)
+            except Exception:
+                logger.error("PQ index sync stopped after item %s", last_id, exc_info=True)
+            if new_ids:
+                self.add_codes(new_ids, np.concatenate(new_codes))
+            self.max_id = last_id
+
+            # 인덱스 범위의 active 행 수가 줄었으면(보관/병합/claimed) 빠진 id를 제거합니다. (id만 읽음)
+            live = LostItem.query.filter(LostItem.id <= self.max_id, *indexed).count()
+            if live < len(self.entries[0]) + len(self.skipped):
+                live_ids = db.session.query(LostItem.id).filter(LostItem.id <= self.max_id, *indexed)
+                self.keep_only(item_id for (item_id,) in live_ids)
+                if self.skipped:
+                    self.skipped = {item_id for (item_id,) in live_ids.filter(LostItem.id.in_(self.skipped))}
+                logger.info("PQ index pruned to %d active items", len(self.entries[0]))
+
+    def _encode_chunk(self, chunk, new_ids, new_codes):
+        """청크에서 쓸 수 있는 벡터만 인코딩해 new_ids/new_codes에 더하고 청크의 마지막 id를 반환합니다."""
+        dim = self.codec.mean.shape[0]
+        ids, vectors, skipped = [], [], []
+        for item_id, vector in chunk:
+            array = _as_vector(vector, dim)
+            if array is None:
+                skipped.append(item_id)
+            else:
+                ids.append(item_id)
+                vectors.append(array)
+        if ids:
+            codes = self.codec.encode(np.stack(vectors))
+            new_ids.extend(ids)
+            new_codes.append(codes)
+        if skipped:
+            logger.warning("PQ index skipped %d items with missing or malformed vectors", len(skipped))
+            self.skipped.update(skipped)
+        return chunk[-1][0]
+
+    def search(self, query, top_k):
+        """ADC로 근사 거리가 가장 작은 top_k개의 (id 배열, 근사 제곱 거리 배열)"""
+        ids, codes = self.entries
+        if not len(ids):
+            return ids, np.empty(0, dtype=np.float32)
+        table = self.codec.lookup_table(query)
+        distances = table[np.arange(self.codec.num_subspaces), codes].sum(axis=1)
+        top_k = min(top_k, len(distances))
+        nearest = np.argpartition(distances, top_k - 1)[:top_k]
+        nearest = nearest[np.argsort(distances[nearest])]
+        return ids[nearest], distances[nearest]
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_pq_index():
+    """프로세스 공용 PQ 인덱스. 학습된 모델 파일이 없으면 None"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                if not os.path.exists(PQ_MODEL_PATH):
+                    return None
+                _index = PQIndex(PQCodec.load(PQ_MODEL_PATH))
+    _index.sync()
+    return _index
+
+def exact_rerank(query_vector, item_ids, top_k):
+    """후보 id들의 원본 벡터로 정확한 코사인 유사도를 계산해 상위 top_k개의 (LostItem, 유사도) 목록"""
+    with prefer_replica(db.session):
+        items = LostItem.query.filter(LostItem.id.in_([int(i) for i in item_ids]),
+                                      LostItem.status == STATUS_ACTIVE).all()
+    items = [item for item in items if item.feature_vector is not None]
+    if not items:
+        return []
+    matrix = _normalize(np.asarray([item.feature_vector for item in items], dtype=np.float32))
+    query = _normalize(np.asarray(query_vector, dtype=np.float32).reshape(1, -1))[0]
+    similarities = matrix @ query
+    order = np.argsort(-similarities)[:top_k]
+    return [(items[i], float(similarities[i])) for i in order]
+
+def search_similar_items(query_vector, top_k=10, rerank=PQ_RERANK):
+    """PQ로 후보 rerank개를 고른 뒤 원본 벡터로 다시 정렬한 (LostItem, 유사도) 목록. 모델이 없으면 None"""
+    index = get_pq_index()
+    if index is None:
+        return None
+    candidate_ids, _ = index.search(query_vector, max(rerank, top_k))
+    return exact_rerank(query_vector, candidate_ids, top_k)
+
+# ====================================================================
+# 이미지 전체 특징 벡터로 유사 물건 검색
+@embedding_index_bp.route('/search_similar_items', methods=['POST'])
+@token_required
+@inference_admission()
+def search_similar_items_route(current_user):
+    image_file = request.files.get('image')
+    if not image_file or image_file.filename == '':
+        return jsonify({'error': '이미지 파일이 필요합니다.'}), 400
+    try:
+        top_k = int(request.form.get('top_k', 10))
+    except ValueError:
+        return jsonify({'error': 'top_k는 정수여야 합니다.'}), 400
+    try:
+        inspect_upload(image_file)
+    except UploadRejected as e:
+        return jsonify({'error': e.message}), e.status_code
+
+    embedder = inference.get_embedding_model()
+    if embedder is None:
+        return jsonify({'error': 'AI 모델이 백엔드에 로드되지 않았습니다.'}), 503
+    query_vector = inference.extract_features_batch(embedder, [open_image(image_file.stream)])[0]
+
+    results = search_similar_items(query_vector, top_k)
+    if results is None:
+        return jsonify({'error': '임베딩 인덱스가 학습되지 않았습니다. (flask pq-train)'}), 503
+    return jsonify({'matches': [{
+        'item_id': item.id,
+        'similarity': similarity,
+        'imageUrl': item.image_url,
+        'description': item.description,
+        'location': item.location,
+    } for item, similarity in results]}), 200
+
+# ====================================================================
+# flask pq-train / pq-eval CLI
+
+def _load_vectors(limit=None):
+    query = db.session.query(LostItem.id, LostItem.feature_vector).order_by(LostItem.id).yield_per(_LOAD_CHUNK)
+    ids, vectors = [], []
+    for item_id, vector in query:
+        if vector is None:
+            continue
+        ids.append(item_id)
+        vectors.append(vector)
+        if limit and len(ids) >= limit:
+            break
+    return np.asarray(ids, dtype=np.int64), np.asarray(vectors, dtype=np.float32)
+
+@click.command('pq-train')
+@click.option('--sample', type=int, default=100000, help='학습에 사용할 최대 벡터 수')
+@click.option('--dim', type=int, default=PQ_DIM, help='PCA 후 차원')
+@click.option('--subspaces', type=int, default=PQ_SUBSPACES, help='부분공간 수 (벡터당 코드 바이트 수)')
+@click.option('--iterations', type=int, default=20, help='k-means 반복 횟수')
+@with_appcontext
+def pq_train_command(sample, dim, subspaces, iterations):
+    """기존 LostItem 임베딩으로 PCA + PQ 모델을 학습해 PQ_MODEL_PATH에 저장합니다."""
+    _, vectors = _load_vectors(sample)
+    if len(vectors) < PQ_CENTROIDS:
+        raise click.ClickException(f'학습하려면 임베딩이 {PQ_CENTROIDS}개 이상 필요합니다. (현재 {len(vectors)}개)')
+    start = time.perf_counter()
+    try:
+        codec = PQCodec.train(vectors, dim, subspaces, iterations)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    codec.save(PQ_MODEL_PATH)
+    click.echo(f"trained on {len(vectors)} vectors in {time.perf_counter() - start:.1f}s: "
+               f"dim={codec.components.shape[1]} subspaces={codec.num_subspaces} -> {PQ_MODEL_PATH}")
+
+@click.command('pq-eval')
+@click.option('--queries', 'num_queries', type=int, default=100, help='질의로 사용할 벡터 수')
+@click.option('--k', 'top_k', type=int, default=10, help='recall@k의 k')
+@click.option('--rerank', type=int, default=PQ_RERANK, help='원본 벡터로 다시 계산할 후보 수')
+@with_appcontext
+def pq_eval_command(num_queries, top_k, rerank):
+    """전수 검색 대비 PQ(+re-ranking) 검색의 recall@k, 질의 지연 시간, 메모리 사용량을 비교합니다."""
+    if not os.path.exists(PQ_MODEL_PATH):
+        raise click.ClickException('PQ 모델이 없습니다. 먼저 flask pq-train을 실행하세요.')
+    ids, vectors = _load_vectors()
+    index = PQIndex(PQCodec.load(PQ_MODEL_PATH))
+    index.add(ids, vectors)
+    normalized = _normalize(vectors)
+
+    rng = np.random.default_rng(0)
+    query_rows = rng.choice(len(vectors), size=min(num_queries, len(vectors)), replace=False)
+    adc_recall, rerank_recall, elapsed = 0.0, 0.0, 0.0
+    for row in query_rows:
+        exact = set(ids[np.argsort(-(normalized @ normalized[row]))[:top_k]].tolist())
+        start = time.perf_counter()
+        candidate_ids, _ = index.search(vectors[row], max(rerank, top_k))
+        elapsed += time.perf_counter() - start
+        adc_recall += len(exact & set(candidate_ids[:top_k].tolist())) / top_k
+        # 후보의 원본 벡터로 다시 정렬 (DB 조회 대신 메모리의 벡터 사용)
+        positions = np.searchsorted(ids, candidate_ids)
+        reranked = candidate_ids[np.argsort(-(normalized[positions] @ normalized[row]))[:top_k]]
+        rerank_recall += len(exact & set(reranked.tolist())) / top_k
+
+    n = len(query_rows)
+    click.echo(f"vectors={len(ids)} queries={n} recall@{top_k}: adc={adc_recall / n:.3f} "
+               f"adc+rerank({rerank})={rerank_recall / n:.3f} scan={elapsed / n * 1000:.2f}ms/query")
+    click.echo(f"memory: float32={vectors.nbytes / 1e6:.1f}MB pq={index.nbytes / 1e6:.2f}MB "
+               f"({vectors.nbytes / max(index.nbytes, 1):.0f}x smaller)")
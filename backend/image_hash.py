@@ -0,0 +1,104 @@
+# image_hash.py
+# 근접 중복 이미지 탐지를 위한 64비트 지각 해시(pHash/dHash)와 해밍 거리 BK-tree
+import numpy as np
+from PIL import Image
+
+from .upload_guard import open_image
+
+HASH_SIZE = 8  # 8x8 = 64비트
+_dct_matrices = {}
+
+def _dct_matrix(size):
+    """DCT-II 변환 행렬 (size x size)"""
+    if size not in _dct_matrices:
+        n = np.arange(size)
+        matrix = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * size))
+        matrix[0] *= np.sqrt(1 / size)
+        matrix[1:] *= np.sqrt(2 / size)
+        _dct_matrices[size] = matrix
+    return _dct_matrices[size]
+
+def _bits_to_int(bits):
+    value = 0
+    for bit in bits.ravel():
+        value = (value << 1) | int(bit)
+    return value
+
+def phash(image, highfreq_factor=4):
+    """
+    DCT 기반 지각 해시. 32x32 흑백 이미지의 저주파 8x8 계수를 중앙값과 비교해 64비트 정수를 만듭니다.
+    약간의 크롭, 재압축, 밝기 변화에도 해밍 거리가 작게 유지됩니다.
+    """
+    size = HASH_SIZE * highfreq_factor
+    pixels = np.asarray(image.convert('L').resize((size, size), Image.LANCZOS), dtype=np.float64)
+    dct = _dct_matrix(size)
+    low_freq = (dct @ pixels @ dct.T)[:HASH_SIZE, :HASH_SIZE]
+    return _bits_to_int(low_freq > np.median(low_freq))
+
+def dhash(image):
+    """인접 픽셀 밝기 차이 기반 해시 (pHash보다 빠르지만 크롭에 약함)"""
+    pixels = np.asarray(image.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS), dtype=np.int16)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+def hash_to_hex(value):
+    return f"{value:016x}"
+
+def hex_to_hash(text):
+    return int(text, 16)
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+def compute_file_hash(image_path):
+    """
+    이미지 파일의 pHash를 16자리 16진수 문자열로 반환합니다.
+    (32x32로 줄여 계산하므로 open_image로 축소 디코딩하며, 일괄 등록과 같은 경로라 해시가 일치합니다)
+    """
+    return hash_to_hex(phash(open_image(image_path)))
+
+class BKTree:
+    """
+    해밍 거리 BK-tree. 각 노드는 (해시, 항목 id 목록, {거리: 자식 노드})이며,
+    삼각 부등식으로 [d - radius, d + radius] 범위의 자식만 탐색합니다.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, value, item_id):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [item_id], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                node[1].append(item_id)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item_id], {}]
+                return
+            node = child
+
+    def search(self, value, radius):
+        """해밍 거리 radius 이내의 (항목 id, 거리) 목록을 거리순으로 반환합니다."""
+        matches = []
+        if self.root is None:
+            return matches
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(value, node[0])
+            if distance <= radius:
+                matches.extend((item_id, distance) for item_id in node[1])
+            for child_distance, child in node[2].items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+        matches.sort(key=lambda match: match[1])
+        return matches
+
+    def __len__(self):
+        return self.size
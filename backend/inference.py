@@ -0,0 +1,523 @@
+# inference.py
+# torch/torchvision 등 무거운 ML 라이브러리는 이 모듈의 함수 안에서만 임포트합니다.
+# (모델은 처음 필요할 때 로드되므로 flask db upgrade 같은 CLI나 인증 요청은 모델을 로드하지 않습니다.)
+import os
+import sys
+import copy
+import time
+import shutil
+import logging
+import threading
+import contextlib
+import importlib.util
+
+import click
+
+from .my_backend_utils import decode_detections
+
+logger = logging.getLogger(__name__)
+
+YOLO_MODEL_PATH = os.getenv('YOLO_MODEL_PATH', 'yolov5')
+# eager: FP32 + channels_last + inference_mode
+# torchscript: trace/freeze된 TorchScript 모델
+# onnx: ONNX Runtime + 동적 INT8 양자화 (onnxruntime 필요)
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'eager')
+INFERENCE_CACHE_DIR = os.getenv('INFERENCE_CACHE_DIR', 'model_cache')
+INFERENCE_BACKENDS = ('eager', 'torchscript', 'onnx')
+# 감지 결과 필터 (신뢰도 하한, 쉼표로 구분한 클래스 이름 목록. 비우면 전체 클래스)
+DETECTION_CONF_THRESHOLD = float(os.getenv('DETECTION_CONF_THRESHOLD', 0.0))
+DETECTION_CLASSES = [c.strip() for c in os.getenv('DETECTION_CLASSES', '').split(',') if c.strip()] or None
+# 객체 크롭 임베딩 대상 (신뢰도 하한, 이미지당 최대 객체 수, 최소 크롭 크기(px))
+OBJECT_EMBEDDING_MIN_CONFIDENCE = float(os.getenv('OBJECT_EMBEDDING_MIN_CONFIDENCE', 0.4))
+OBJECT_EMBEDDING_MAX_OBJECTS = int(os.getenv('OBJECT_EMBEDDING_MAX_OBJECTS', 10))
+OBJECT_EMBEDDING_MIN_SIZE = int(os.getenv('OBJECT_EMBEDDING_MIN_SIZE', 16))
+# 한 프로세스에서 동시에 실행할 추론 수와 추론 1건이 사용할 intra-op 스레드 수
+# (기본값은 두 값의 곱이 CPU 코어 수를 넘지 않도록 설정)
+INFERENCE_MAX_CONCURRENCY = int(os.getenv('INFERENCE_MAX_CONCURRENCY', max(1, (os.cpu_count() or 1) // 2)))
+INFERENCE_THREADS_PER_CALL = int(os.getenv('INFERENCE_THREADS_PER_CALL',
+                                           max(1, (os.cpu_count() or 1) // INFERENCE_MAX_CONCURRENCY)))
+
+_preprocess = None
+
+def get_preprocess():
+    """이미지 전처리 파이프라인 (ResNet50 입력용)"""
+    global _preprocess
+    if _preprocess is None:
+        import torchvision.transforms as transforms
+        _preprocess = transforms.Compose([
+            transforms.Resize(256),
+            transforms.CenterCrop(224),
+            transforms.ToTensor(),
+            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
+        ])
+    return _preprocess
+
+# ====================================================================
+# 동시성 제어
+
+_inference_semaphore = threading.BoundedSemaphore(INFERENCE_MAX_CONCURRENCY)
+_thread_state = threading.local()
+
+def configure_inference_concurrency(max_concurrency, threads_per_call):
+    """동시 추론 슬롯 수와 추론 1건당 스레드 수를 바꿉니다. (모델 로드 전에 호출해야 합니다)"""
+    import torch
+
+    global INFERENCE_MAX_CONCURRENCY, INFERENCE_THREADS_PER_CALL, _inference_semaphore
+    INFERENCE_MAX_CONCURRENCY = max(1, max_concurrency)
+    INFERENCE_THREADS_PER_CALL = max(1, threads_per_call)
+    _inference_semaphore = threading.BoundedSemaphore(INFERENCE_MAX_CONCURRENCY)
+    torch.set_num_threads(INFERENCE_THREADS_PER_CALL)
+
+@contextlib.contextmanager
+def inference_slot():
+    """
+    추론 구간을 감쌉니다. 동시에 INFERENCE_MAX_CONCURRENCY건까지만 실행되며,
+    OpenMP 스레드 수는 스레드별 설정이므로 각 요청 스레드에서 처음 한 번 예산에 맞춥니다.
+    """
+    with _inference_semaphore:
+        if getattr(_thread_state, 'num_threads', None) != INFERENCE_THREADS_PER_CALL:
+            import torch
+            torch.set_num_threads(INFERENCE_THREADS_PER_CALL)
+            _thread_state.num_threads = INFERENCE_THREADS_PER_CALL
+        yield
+
+def load_yolo_model(model_path=None):
+    """YOLOv5 모델을 로드합니다. 실패하면 None을 반환합니다."""
+    try:
+        import torch
+        # 'yolov5s'가 공식 모델명입니다.
+        yolo_model = torch.hub.load(
+            model_path or YOLO_MODEL_PATH,
+            'yolov5s',
+            source='local',
+            pretrained=True
+        )
+        yolo_model.eval()
+        logger.info("YOLOv5 model loaded successfully.")
+        return yolo_model
+    except Exception as e:
+        logger.error("Error loading YOLOv5 model: %s", e, exc_info=True)
+        return None
+
+def load_feature_extractor():
+    """ResNet50 특징 추출 모델을 로드합니다. 실패하면 None을 반환합니다."""
+    try:
+        from torchvision import models
+        extractor = models.resnet50(pretrained=True)
+        extractor.eval()
+        logger.info("ResNet50 feature extractor loaded successfully.")
+        return extractor
+    except Exception as e:
+        logger.error("Error loading feature extractor (ResNet50): %s", e, exc_info=True)
+        return None
+
+def make_headless(extractor):
+    """
+    분류 헤드(fc)를 영구적으로 제거한 임베딩 전용 복사본을 만듭니다. 출력은 2048차원입니다.
+    추론 중에는 모듈을 절대 수정하지 않으므로 여러 스레드가 같은 모델을 공유할 수 있습니다.
+    """
+    import torch
+
+    headless = copy.deepcopy(extractor)
+    headless.fc = torch.nn.Identity()
+    headless.eval()
+    headless.requires_grad_(False)
+    return headless
+
+# ====================================================================
+# 백엔드별 모델 준비 (내보내기 결과는 INFERENCE_CACHE_DIR에 한 번만 저장)
+
+def _cache_path(name):
+    os.makedirs(INFERENCE_CACHE_DIR, exist_ok=True)
+    return os.path.join(INFERENCE_CACHE_DIR, name)
+
+def _tmp_path(path):
+    # 여러 gunicorn/풀 워커가 동시에 내보내도 완성된 파일만 보이도록 임시 파일 후 os.replace
+    return f"{path}.{os.getpid()}.tmp"
+
+def _eager_embedder(headless):
+    import torch
+
+    headless = headless.to(memory_format=torch.channels_last)
+
+    def embed(batch):
+        with inference_slot(), torch.inference_mode():
+            return headless(batch.contiguous(memory_format=torch.channels_last)).numpy()
+    embed.backend = 'eager'
+    return embed
+
+def _torchscript_embedder(headless):
+    import torch
+
+    path = _cache_path('resnet50_headless.torchscript.pt')
+    if not os.path.exists(path):
+        example = torch.randn(1, 3, 224, 224).contiguous(memory_format=torch.channels_last)
+        with torch.no_grad():
+            traced = torch.jit.trace(headless.to(memory_format=torch.channels_last), example)
+        tmp_path = _tmp_path(path)
+        traced.save(tmp_path)
+        os.replace(tmp_path, path)
+        logger.info("ResNet50 TorchScript exported to %s", path)
+    scripted = torch.jit.optimize_for_inference(torch.jit.load(path).eval())
+
+    def embed(batch):
+        with inference_slot(), torch.inference_mode():
+            return scripted(batch.contiguous(memory_format=torch.channels_last)).numpy()
+    embed.backend = 'torchscript'
+    return embed
+
+def _onnx_embedder(headless):
+    import torch
+    import onnxruntime as ort
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    path = _cache_path('resnet50_headless.int8.onnx')
+    if not os.path.exists(path):
+        fp32_path = _tmp_path(_cache_path('resnet50_headless.onnx'))
+        torch.onnx.export(
+            headless, torch.randn(1, 3, 224, 224), fp32_path,
+            input_names=['input'], output_names=['embedding'],
+            dynamic_axes={'input': {0: 'batch'}, 'embedding': {0: 'batch'}},
+            opset_version=13,
+        )
+        tmp_path = _tmp_path(path)
+        quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QUInt8)
+        os.remove(fp32_path)
+        os.replace(tmp_path, path)
+        logger.info("ResNet50 INT8 ONNX exported to %s", path)
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = INFERENCE_THREADS_PER_CALL
+    session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+
+    def embed(batch):
+        # InferenceSession.run은 스레드 안전합니다.
+        with inference_slot():
+            return session.run(None, {'input': batch.numpy()})[0]
+    embed.backend = 'onnx'
+    return embed
+
+_EMBEDDERS = {'eager': _eager_embedder, 'torchscript': _torchscript_embedder, 'onnx': _onnx_embedder}
+
+def load_embedding_model(backend=None):
+    """
+    설정된 백엔드로 헤드 없는 ResNet50 임베딩 함수를 만듭니다.
+    반환된 함수는 (N, 3, 224, 224) 텐서를 받아 (N, 2048) ndarray를 돌려줍니다.
+    백엔드 준비에 실패하면 eager로 대체하고, 모델 로드 자체가 실패하면 None을 반환합니다.
+    """
+    backend = backend or INFERENCE_BACKEND
+    extractor = load_feature_extractor()
+    if extractor is None:
+        return None
+    headless = make_headless(extractor)
+    if backend not in _EMBEDDERS:
+        logger.warning("Unknown INFERENCE_BACKEND '%s'. Falling back to eager.", backend)
+        backend = 'eager'
+    try:
+        return _EMBEDDERS[backend](headless)
+    except Exception as e:
+        logger.error("Error preparing '%s' embedding backend, falling back to eager: %s", backend, e, exc_info=True)
+        return _eager_embedder(headless)
+
+def _export_yolo(backend):
+    """yolov5 저장소의 export.py로 YOLOv5s를 TorchScript/ONNX로 내보냅니다. (ONNX는 동적 INT8 양자화)"""
+    target = _cache_path('yolov5s.int8.onnx' if backend == 'onnx' else 'yolov5s.torchscript')
+    if os.path.exists(target):
+        return target
+
+    weights = os.path.join(YOLO_MODEL_PATH, 'yolov5s.pt')
+    if not os.path.exists(weights):
+        weights = 'yolov5s.pt'
+    work_dir = _tmp_path(_cache_path('yolo_export'))
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        local_weights = os.path.join(work_dir, 'yolov5s.pt')
+        shutil.copy(weights, local_weights)
+
+        spec = importlib.util.spec_from_file_location('yolov5_export', os.path.join(YOLO_MODEL_PATH, 'export.py'))
+        yolo_export = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(yolo_export)
+        exported = yolo_export.run(weights=local_weights, include=(backend,), imgsz=(640, 640),
+                                   device='cpu', dynamic=(backend == 'onnx'))
+        exported_path = [f for f in exported if f][0]
+
+        if backend == 'onnx':
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            quantized_path = os.path.join(work_dir, 'yolov5s.int8.onnx')
+            quantize_dynamic(exported_path, quantized_path, weight_type=QuantType.QUInt8)
+            exported_path = quantized_path
+        os.replace(exported_path, target)
+        logger.info("YOLOv5 %s model exported to %s", backend, target)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return target
+
+def load_detection_model(backend=None):
+    """
+    설정된 백엔드로 YOLOv5 모델을 로드합니다. 내보낸 모델도 AutoShape로 감싸지므로
+    eager 모델과 같은 방식(model(images))으로 호출할 수 있습니다.
+    """
+    backend = backend or INFERENCE_BACKEND
+    if backend in ('torchscript', 'onnx'):
+        try:
+            import torch
+            weights = _export_yolo(backend)
+            yolo_model = torch.hub.load(YOLO_MODEL_PATH, 'custom', path=weights, source='local')
+            yolo_model.eval()
+            logger.info("YOLOv5 model loaded with '%s' backend.", backend)
+            return yolo_model
+        except Exception as e:
+            logger.error("Error preparing '%s' YOLOv5 backend, falling back to eager: %s", backend, e, exc_info=True)
+    return load_yolo_model()
+
+# ====================================================================
+# 배치 추론
+
+def detect_batch(yolo_model, images, conf_threshold=None, classes=None):
+    """
+    여러 PIL 이미지를 한 번의 YOLOv5 forward pass로 감지하고 decode_detections 형식으로 반환합니다.
+    (AutoShape 모델은 입력 이미지 좌표계로 박스를 돌려주고, open_image로 줄여서 디코딩한 이미지는
+    원본 크기 배율을 곱해 박스를 원본 이미지 좌표로 되돌립니다.)
+    """
+    import torch
+    from .upload_guard import original_scale
+    from .profiling import profile_stage
+
+    with profile_stage('yolo_detect'), inference_slot(), torch.inference_mode():
+        results = yolo_model(images)
+    return decode_detections(
+        results,
+        conf_threshold=DETECTION_CONF_THRESHOLD if conf_threshold is None else conf_threshold,
+        classes=DETECTION_CLASSES if classes is None else classes,
+        scales=[original_scale(image) for image in images],
+    )
+
+def extract_features_batch(embedder, images):
+    """여러 PIL 이미지를 한 번의 forward pass로 임베딩합니다. (N, 2048) 배열을 반환합니다."""
+    import torch
+    from .profiling import profile_stage
+
+    preprocess = get_preprocess()
+    with profile_stage('resnet_preprocess'):
+        batch = torch.stack([preprocess(image) for image in images])
+    with profile_stage('resnet_embed'):
+        return embedder(batch)
+
+def crop_objects(image, detections, min_confidence=None, max_objects=None):
+    """
+    신뢰도 기준 이상인 감지 박스를 신뢰도 순으로 잘라 (감지 결과, 크롭 이미지) 목록으로 반환합니다.
+    박스는 원본 이미지 좌표이므로 줄여서 디코딩한 이미지에서는 배율로 나누어 자릅니다.
+    """
+    from .upload_guard import original_scale
+
+    min_confidence = OBJECT_EMBEDDING_MIN_CONFIDENCE if min_confidence is None else min_confidence
+    max_objects = OBJECT_EMBEDDING_MAX_OBJECTS if max_objects is None else max_objects
+    candidates = sorted(
+        (d for d in detections if 'box' in d and d.get('confidence', 0.0) >= min_confidence),
+        key=lambda d: d['confidence'], reverse=True,
+    )[:max_objects]
+
+    width, height = image.size
+    scale_x, scale_y = original_scale(image)
+    crops = []
+    for detection in candidates:
+        box = detection['box']
+        x1, y1 = max(0, int(box['x'] / scale_x)), max(0, int(box['y'] / scale_y))
+        x2 = min(width, int((box['x'] + box['width']) / scale_x))
+        y2 = min(height, int((box['y'] + box['height']) / scale_y))
+        if x2 - x1 < OBJECT_EMBEDDING_MIN_SIZE or y2 - y1 < OBJECT_EMBEDDING_MIN_SIZE:
+            continue
+        crops.append((detection, image.crop((x1, y1, x2, y2))))
+    return crops
+
+def extract_object_features_batch(embedder, images, detections_per_image):
+    """
+    모든 이미지의 객체 크롭을 한 번의 forward pass로 임베딩합니다.
+    이미지별로 [(감지 결과, 특징 벡터), ...] 목록을 반환합니다.
+    """
+    crops_per_image = [crop_objects(image, detections) for image, detections in zip(images, detections_per_image)]
+    flat_crops = [crop for crops in crops_per_image for _, crop in crops]
+    if not flat_crops:
+        return [[] for _ in images]
+
+    vectors = extract_features_batch(embedder, flat_crops)
+    object_features, offset = [], 0
+    for crops in crops_per_image:
+        object_features.append([(detection, vectors[offset + i]) for i, (detection, _) in enumerate(crops)])
+        offset += len(crops)
+    return object_features
+
+# ====================================================================
+# 지연 로드되는 프로세스 공용 모델
+
+_models = {}
+_models_lock = threading.Lock()
+_warmup_started = threading.Event()
+
+def _get_model(key, loader):
+    if key not in _models:
+        with _models_lock:
+            if key not in _models:
+                _models[key] = loader()
+    return _models[key]
+
+def get_detection_model():
+    """프로세스 공용 YOLOv5 모델을 처음 호출될 때 로드해 반환합니다. 로드 실패 시 None"""
+    return _get_model('detection', load_detection_model)
+
+def get_embedding_model():
+    """프로세스 공용 임베딩 모델을 처음 호출될 때 로드해 반환합니다. 로드 실패 시 None"""
+    return _get_model('embedding', load_embedding_model)
+
+def models_status():
+    """모델별 상태를 'not_loaded', 'loading', 'ready', 'failed' 중 하나로 돌려줍니다."""
+    status = {}
+    for key in ('detection', 'embedding'):
+        if key in _models:
+            status[key] = 'ready' if _models[key] is not None else 'failed'
+        else:
+            status[key] = 'loading' if _warmup_started.is_set() else 'not_loaded'
+    return status
+
+def models_warm():
+    return all(value == 'ready' for value in models_status().values())
+
+def warm_up_async():
+    """백그라운드 스레드에서 모델을 미리 로드합니다. 프로세스당 한 번만 실행됩니다."""
+    if _warmup_started.is_set():
+        return
+    _warmup_started.set()
+
+    def warm_up():
+        start = time.perf_counter()
+        get_detection_model()
+        get_embedding_model()
+        logger.info("Inference models warmed up in %.2fs: %s", time.perf_counter() - start, models_status())
+    threading.Thread(target=warm_up, name='inference-warmup', daemon=True).start()
+
+# ====================================================================
+# 단일 이미지 추론 (라우트용)
+
+def extract_features(image_path):
+    """이미지 한 장의 2048차원 특징 벡터를 추출합니다. 실패하면 None을 반환합니다."""
+    embedder = get_embedding_model()
+    if embedder is None:
+        logger.error("Feature extractor not loaded. Cannot extract features.")
+        return None
+    try:
+        from .upload_guard import open_image
+        image = open_image(image_path)
+        return extract_features_batch(embedder, [image])[0]
+    except Exception as e:
+        logger.error("Error extracting features from %s: %s", image_path, e, exc_info=True)
+        return None
+
+def extract_object_features(image_path, detections):
+    """이미지 한 장의 감지 객체별 (감지 결과, 특징 벡터) 목록. 모델이 없거나 실패하면 빈 목록"""
+    embedder = get_embedding_model()
+    if embedder is None:
+        return []
+    try:
+        from .upload_guard import open_image
+        image = open_image(image_path)
+        return extract_object_features_batch(embedder, [image], [detections])[0]
+    except Exception as e:
+        logger.error("Error extracting object features from %s: %s", image_path, e, exc_info=True)
+        return []
+
+def calculate_similarity(vec1, vec2):
+    """두 특징 벡터의 코사인 유사도"""
+    import numpy as np
+
+    if vec1 is None or vec2 is None:
+        return 0.0
+    vec1 = np.asarray(vec1, dtype=np.float32).ravel()
+    vec2 = np.asarray(vec2, dtype=np.float32).ravel()
+    denominator = np.linalg.norm(vec1) * np.linalg.norm(vec2)
+    return float(vec1 @ vec2 / denominator) if denominator else 0.0
+
+def detect_objects_yolov5(image_path):
+    """
+    YOLOv5로 이미지 한 장을 감지해 decode_detections 형식의 리스트를 반환합니다.
+    감지 결과가 없거나 실패하면 parse_predictions가 그대로 전달하는 info/warning/error 메시지 하나를 담아 반환합니다.
+    """
+    yolo_model = get_detection_model()
+    if yolo_model is None:
+        logger.error("YOLOv5 model not loaded. Cannot perform object detection.")
+        return [{"warning": "YOLO 모델이 백엔드에 로드되지 않았습니다."}]
+    try:
+        from .upload_guard import open_image
+        img = open_image(image_path)
+        detections = detect_batch(yolo_model, [img])[0]
+        if not detections:
+            return [{"info": "이미지에서 감지된 물건이 없습니다."}]
+        return detections
+    except Exception as e:
+        logger.error("Error detecting objects with YOLOv5 from %s: %s", image_path, e, exc_info=True)
+        return [{"error": f"YOLO 감지 처리 실패: {str(e)}"}]
+
+# ====================================================================
+# 정확도/지연 시간 비교 (eager FP32 기준)
+
+def check_parity(image_paths, backend=None):
+    """
+    eager FP32 모델과 선택한 백엔드의 임베딩 코사인 유사도, 감지 레이블 일치율,
+    이미지당 지연 시간(ms)을 비교합니다.
+    """
+    import numpy as np
+    from PIL import Image
+
+    backend = backend or INFERENCE_BACKEND
+    images = [Image.open(path).convert('RGB') for path in image_paths]
+
+    def timed(fn, *args):
+        fn(*args)  # 워밍업
+        start = time.perf_counter()
+        output = fn(*args)
+        return output, (time.perf_counter() - start) * 1000 / len(images)
+
+    eager_embed = load_embedding_model('eager')
+    target_embed = load_embedding_model(backend)
+    eager_vectors, eager_embed_ms = timed(extract_features_batch, eager_embed, images)
+    target_vectors, target_embed_ms = timed(extract_features_batch, target_embed, images)
+    cosine = (eager_vectors * target_vectors).sum(axis=1) / (
+        np.linalg.norm(eager_vectors, axis=1) * np.linalg.norm(target_vectors, axis=1) + 1e-12)
+
+    eager_yolo = load_yolo_model()
+    target_yolo = load_detection_model(backend)
+    eager_detections, eager_detect_ms = timed(detect_batch, eager_yolo, images)
+    target_detections, target_detect_ms = timed(detect_batch, target_yolo, images)
+    agreements = []
+    for expected, actual in zip(eager_detections, target_detections):
+        expected_labels = {d['label'] for d in expected}
+        actual_labels = {d['label'] for d in actual}
+        union = expected_labels | actual_labels
+        agreements.append(len(expected_labels & actual_labels) / len(union) if union else 1.0)
+
+    return {
+        'backend': getattr(target_embed, 'backend', backend),
+        'images': len(images),
+        'embedding_cosine_min': float(cosine.min()),
+        'embedding_cosine_mean': float(cosine.mean()),
+        'detection_label_agreement': float(np.mean(agreements)),
+        'eager_ms_per_image': eager_embed_ms + eager_detect_ms,
+        'backend_ms_per_image': target_embed_ms + target_detect_ms,
+    }
+
+@click.command('inference-check')
+@click.argument('image_dir', type=click.Path(exists=True, file_okay=False))
+@click.option('--backend', type=click.Choice(INFERENCE_BACKENDS), default=None, help='비교할 백엔드 (기본: INFERENCE_BACKEND)')
+@click.option('--min-cosine', type=float, default=0.99, show_default=True, help='허용할 최소 임베딩 코사인 유사도')
+def inference_check_command(image_dir, backend, min_cosine):
+    """eager 모델 대비 최적화 백엔드의 정확도와 CPU 지연 시간을 확인합니다."""
+    image_paths = sorted(
+        os.path.join(image_dir, name) for name in os.listdir(image_dir)
+        if name.lower().rsplit('.', 1)[-1] in ('png', 'jpg', 'jpeg', 'gif')
+    )
+    if not image_paths:
+        raise click.ClickException('비교할 이미지가 없습니다.')
+    report = check_parity(image_paths, backend)
+    for key, value in report.items():
+        click.echo(f'{key}: {value}')
+    if report['embedding_cosine_min'] < min_cosine:
+        click.echo(f"임베딩 코사인 유사도가 기준({min_cosine})보다 낮습니다.", err=True)
+        sys.exit(1)
@@ -0,0 +1,109 @@
+# json_provider.py
+# API 응답과 DB JSON 컬럼 직렬화에 쓰는 JSON 변환기.
+# orjson이 설치되어 있으면 orjson으로, 없으면 표준 json 모듈로 직렬화합니다.
+# 두 경우 모두 NumPy 배열/스칼라와 datetime/date를 직접 처리하므로 .tolist()나 .isoformat()을 부를 필요가 없습니다.
+import json
+import time
+import datetime
+
+import click
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson이 없으면 표준 json 모듈 사용
+    orjson = None
+
+def _default(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj):
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+    def dumps(obj):
+        return dumps_bytes(obj).decode('utf-8')
+
+    loads = orjson.loads
+else:
+    def dumps(obj):
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':'))
+
+    def dumps_bytes(obj):
+        return dumps(obj).encode('utf-8')
+
+    loads = json.loads
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    app.json으로 등록하는 JSON provider. jsonify와 app.json.dumps가 모두 이 provider를 사용합니다.
+    (sort_keys/indent 같은 인자를 넘긴 호출은 기본 provider 동작을 그대로 따릅니다.)
+    """
+
+    default = staticmethod(_default)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
+
+# ====================================================================
+# flask json-benchmark CLI (표준 json + Flask 기본 변환 vs 이 모듈의 변환기)
+
+def _sample_listing(num_items):
+    rng = np.random.default_rng(0)
+    now = datetime.datetime.now()
+    return {'all_items': [{
+        'id': i,
+        'imageUrl': f'/uploads/item_{i}.jpg',
+        'description': '검은색 가죽 지갑',
+        'location': '중앙도서관 2층',
+        'upload_date': now,
+        'predictions': [
+            {'box': {'x': float(x), 'y': float(y), 'width': float(w), 'height': float(h)},
+             'confidence': float(c), 'label': 'handbag'}
+            for x, y, w, h, c in rng.random((3, 5)) * [640, 480, 200, 200, 1]
+        ],
+        'user_id': i % 50,
+    } for i in range(num_items)]}
+
+@click.command('json-benchmark')
+@click.option('--items', 'num_items', type=int, default=10000, help='목록 항목 수')
+@click.option('--repeat', type=int, default=5, help='반복 횟수 (최솟값을 보고)')
+def json_benchmark_command(num_items, repeat):
+    """목록 응답 크기의 데이터로 표준 json과 현재 JSON 변환기의 직렬화 시간을 비교합니다."""
+    payload = _sample_listing(num_items)
+
+    def best_of(fn):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(payload)
+            timings.append((time.perf_counter() - start) * 1000)
+        return min(timings)
+
+    baseline = best_of(lambda obj: json.dumps(obj, default=_default))
+    current = best_of(dumps_bytes)
+    backend = 'orjson' if orjson is not None else 'json (fallback)'
+    click.echo(f"items={num_items} stdlib_json={baseline:.1f}ms {backend}={current:.1f}ms "
+               f"speedup={baseline / current:.1f}x")
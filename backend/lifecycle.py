@@ -0,0 +1,106 @@
+# lifecycle.py
+# LostItem 수명 주기: active -> claimed, 그리고 오래되었거나 claimed인 행을 ArchivedLostItem으로 옮기는 보관 작업.
+# LostItem에는 hot 행만 남으므로 목록/매칭은 기본적으로 작은 테이블만 조회하고,
+# include_archived를 지정한 경우에만 보관 테이블을 함께 조회합니다.
+import os
+import logging
+import datetime
+
+import click
+from flask import Blueprint, request, jsonify, current_app
+from flask.cli import with_appcontext
+from sqlalchemy import or_
+
+from .my_models import db, LostItem, ArchivedLostItem, ObjectEmbedding
+from .db_routing import use_primary
+from .auth import admin_required
+
+lifecycle_bp = Blueprint('lifecycle', __name__, url_prefix='/api/admin')
+logger = logging.getLogger(__name__)
+
+STATUS_ACTIVE = 'active'
+STATUS_CLAIMED = 'claimed'
+
+# LostItem에서 ArchivedLostItem으로 그대로 복사하는 컬럼
+_ARCHIVED_COLUMNS = [column.name for column in ArchivedLostItem.__table__.columns if column.name != 'archived_at']
+
+def configure_lifecycle(app):
+    """앱 설정에 보관 작업 기본값을 채웁니다."""
+    app.config.setdefault('LIFECYCLE_RETENTION_DAYS', int(os.getenv('LIFECYCLE_RETENTION_DAYS', 180)))
+    app.config.setdefault('LIFECYCLE_ARCHIVE_BATCH_SIZE', int(os.getenv('LIFECYCLE_ARCHIVE_BATCH_SIZE', 500)))
+
+def include_archived_requested():
+    """요청의 include_archived 값 (쿼리 문자열 또는 폼)"""
+    value = request.values.get('include_archived', '')
+    return value.lower() in ('1', 'true', 'yes')
+
+def archived_items(*criteria):
+    """criteria에 맞는 보관된 물건 목록 (ArchivedLostItem 컬럼 기준 조건)"""
+    return ArchivedLostItem.query.filter(*criteria).order_by(ArchivedLostItem.id).all()
+
+def archive_cold_items(cutoff, batch_size, dry_run=False):
+    """
+    claimed이거나 cutoff 이전에 등록된 LostItem을 batch_size개씩 ArchivedLostItem으로 옮깁니다.
+    (배치마다 복사 -> 객체 임베딩 삭제 -> 원본 삭제를 한 트랜잭션으로 커밋)
+    옮긴 행 수를 반환합니다.
+    복제본에서 읽으면 지연된 행(방금 claimed로 바뀐 상태 누락, 이미 옮긴 행)을 복사/삭제할 수 있으므로 primary에서만 읽습니다.
+    """
+    with use_primary(db.session):
+        return _archive_batches(cutoff, batch_size, dry_run)
+
+def _archive_batches(cutoff, batch_size, dry_run):
+    cold = or_(LostItem.status == STATUS_CLAIMED, LostItem.created_at < cutoff)
+    if dry_run:
+        return LostItem.query.filter(cold).count()
+
+    moved = 0
+    while True:
+        items = LostItem.query.filter(cold).order_by(LostItem.id).limit(batch_size).all()
+        if not items:
+            return moved
+        ids = [item.id for item in items]
+        try:
+            db.session.bulk_insert_mappings(ArchivedLostItem, [
+                {name: getattr(item, name) for name in _ARCHIVED_COLUMNS} for item in items
+            ])
+            # 객체 임베딩은 hot 물건 검색용이므로 보관할 때 지웁니다.
+            ObjectEmbedding.query.filter(ObjectEmbedding.lost_item_id.in_(ids)).delete(synchronize_session=False)
+            LostItem.query.filter(LostItem.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            db.session.expunge_all()
+        moved += len(ids)
+        logger.info("Archived %d lost items (total %d), last id %s", len(ids), moved, ids[-1])
+
+# ====================================================================
+# 관리자 - 주인이 찾아간 물건 표시
+@lifecycle_bp.route('/lost_items/<int:item_id>/claim', methods=['POST'])
+@admin_required
+def claim_lost_item(current_user, item_id):
+    item = LostItem.query.get(item_id)
+    if item is None:
+        return jsonify({'error': '물건을 찾을 수 없습니다.'}), 404
+    item.status = STATUS_CLAIMED
+    item.claimed_at = datetime.datetime.now()
+    db.session.commit()
+    logger.info("Lost item %s marked as claimed by admin %s", item_id, current_user.id)
+    return jsonify({'message': '찾아간 물건으로 표시되었습니다.', 'item_id': item_id, 'status': item.status}), 200
+
+# ====================================================================
+# flask archive-lost-items CLI (cron 등으로 주기적으로 실행)
+@click.command('archive-lost-items')
+@click.option('--retention-days', type=int, default=None, help='이 일수보다 오래된 물건을 보관 (기본: LIFECYCLE_RETENTION_DAYS)')
+@click.option('--batch-size', type=int, default=None, help='한 트랜잭션에서 옮길 행 수')
+@click.option('--dry-run', is_flag=True, help='옮길 행 수만 출력')
+@with_appcontext
+def archive_lost_items_command(retention_days, batch_size, dry_run):
+    """claimed이거나 보관 기간이 지난 LostItem을 보관 테이블로 옮깁니다."""
+    retention_days = retention_days or current_app.config['LIFECYCLE_RETENTION_DAYS']
+    batch_size = batch_size or current_app.config['LIFECYCLE_ARCHIVE_BATCH_SIZE']
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=retention_days)
+    moved = archive_cold_items(cutoff, batch_size, dry_run=dry_run)
+    verb = '보관 대상' if dry_run else '보관 완료'
+    click.echo(f"{verb}: {moved}건 (기준: {cutoff:%Y-%m-%d} 이전 등록 또는 claimed)")
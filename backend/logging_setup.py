@@ -0,0 +1,142 @@
+# logging_setup.py
+# 로그를 요청 스레드에서 바로 쓰지 않고 QueueHandler로 큐에 넣은 뒤, QueueListener 스레드가 JSON 한 줄씩 stderr에 씁니다.
+# 요청 스레드에서는 레벨을 통과한 레코드의 메시지 조합(%-스타일 인자)만 하고, JSON 변환과 I/O는 리스너 스레드에서 합니다.
+# 로그 호출은 logger.debug("... %s", value)처럼 인자를 넘겨 레벨에서 걸러지면 포맷 비용이 들지 않게 합니다.
+import os
+import sys
+import queue
+import atexit
+import logging
+import datetime
+import itertools
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import has_request_context, request, g
+
+from .json_provider import dumps as json_dumps
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# json: 한 줄에 JSON 객체 하나, text: 사람이 읽기 쉬운 기존 형식
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+# sampled_log로 남기는 행 단위 로그는 같은 메시지 LOG_SAMPLE_EVERY번 중 1번만 기록
+LOG_SAMPLE_EVERY = int(os.getenv('LOG_SAMPLE_EVERY', 100))
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# LogRecord 기본 속성 (이 밖의 속성은 extra로 넘긴 값이므로 JSON에 그대로 포함)
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+class JsonFormatter(logging.Formatter):
+    """LogRecord를 JSON 한 줄로 바꾸는 포매터"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value if isinstance(value, (str, int, float, bool, type(None))) else repr(value)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json_dumps(entry)
+
+class AsyncQueueHandler(QueueHandler):
+    """
+    요청 정보(메서드/경로/사용자)를 붙여 큐에 넣는 QueueHandler.
+    큐가 가득 차면 요청 스레드를 막지 않고 레코드를 버린 뒤 버린 개수를 다음 레코드에 기록합니다.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # 리스너 스레드에서는 요청 컨텍스트와 예외 객체에 접근할 수 없으므로 여기서 문자열로 만들어 둡니다.
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if has_request_context():
+            record.method = request.method
+            record.path = request.path
+            user_id = g.get('user_id')
+            if user_id is not None:
+                record.user_id = user_id
+        if self.dropped:
+            record.dropped, self.dropped = self.dropped, 0
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_handler = None
+_listener = None
+
+def _output_handler():
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if LOG_FORMAT == 'json' else logging.Formatter(TEXT_FORMAT))
+    return handler
+
+def _start_listener():
+    global _listener
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    _handler.queue = log_queue
+    _listener = QueueListener(log_queue, _output_handler(), respect_handler_level=False)
+    _listener.start()
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+def configure_logging(level=None):
+    """
+    루트 로거에 비동기 JSON 핸들러를 설치합니다. (여러 번 호출해도 한 번만 설치)
+    level을 주지 않으면 LOG_LEVEL 환경 변수를 따릅니다.
+    """
+    global _handler
+    root = logging.getLogger()
+    root.setLevel(level or LOG_LEVEL)
+    if _handler is not None:
+        return
+    _handler = AsyncQueueHandler(None)
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(_handler)
+    _start_listener()
+    atexit.register(_stop_listener)
+    # fork로 만든 자식(gunicorn --preload 워커 등)에는 리스너 스레드가 없으므로 새로 시작합니다.
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_start_listener)
+
+# ====================================================================
+# 행 단위 로그 샘플링
+
+_sample_counters = {}
+
+def sampled_log(logger, level, msg, *args, every=None):
+    """
+    목록/매칭 결과처럼 행마다 남기는 로그를 같은 msg(포맷 문자열)별로 every번 중 1번만 기록합니다.
+    레벨에서 걸러지면 카운터도 세지 않으므로 비용이 거의 없습니다.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    every = every or LOG_SAMPLE_EVERY
+    counter = _sample_counters.get(msg)
+    if counter is None:
+        counter = _sample_counters.setdefault(msg, itertools.count())
+    if next(counter) % every == 0:
+        logger.log(level, msg, *args, extra={'sample_every': every}, stacklevel=2)
@@ -0,0 +1,394 @@
+# matching.py
+# 분실 신고 매칭을 지역(region) 단위로 나누어 매처 프로세스들에서 병렬로 수행합니다. (scatter-gather)
+# - LostItem.location에서 지역을 구하고, 지역마다 담당 매처 프로세스를 정합니다. (crc32 % 프로세스 수)
+# - 각 매처 프로세스는 담당 지역의 매칭용 후보(장소, 설명 단어, 감지 레이블, 날짜)를 메모리에 들고 있습니다.
+# - 코디네이터(요청 프로세스)는 신고 지역과 이웃 지역을 담당하는 프로세스들에 동시에 요청을 보내고
+#   각자의 top-k를 받아 합칩니다. 메시지 기반이므로 이후 프로세스를 다른 노드로 옮길 수 있습니다.
+import os
+import json
+import zlib
+import time
+import heapq
+import logging
+import datetime
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from flask import current_app
+from sqlalchemy import or_
+
+from .my_models import db, LostItem
+from .db_routing import prefer_replica
+
+logger = logging.getLogger(__name__)
+
+MIN_MATCH_SCORE = 10
+
+# sync에서 읽는 LostItem 컬럼 (특징 벡터 같은 큰 컬럼은 읽지 않음)
+_SYNC_COLUMNS = (LostItem.id, LostItem.location, LostItem.description, LostItem.detection_results,
+                 LostItem.upload_date, LostItem.status, LostItem.updated_at)
+
+def configure_matching(app):
+    """앱 설정에 매칭 기본값을 채웁니다."""
+    # 매처 프로세스 수 (0이면 요청 스레드에서 직접 매칭)
+    app.config.setdefault('MATCH_WORKERS', int(os.getenv('MATCH_WORKERS', 2)))
+    # 신고당 반환할 최대 매칭 수 (0이면 기존처럼 기준 점수 이상인 매칭을 모두 반환)
+    app.config.setdefault('MATCH_TOP_K', int(os.getenv('MATCH_TOP_K', 0)))
+    app.config.setdefault('MATCH_TIMEOUT', float(os.getenv('MATCH_TIMEOUT', 10)))
+    # {"지역": ["장소에 포함되면 이 지역으로 보는 키워드", ...]}
+    # 설정하지 않으면(기본) 모든 신고를 전체 파티션과 비교해 기존 매칭과 같은 결과를 냅니다.
+    # 설정하면 키워드로 지역이 정해지는 신고는 그 지역 + 이웃 지역 파티션만 비교하므로 빨라지지만,
+    # 다른 지역에 등록된 물건은 레이블/설명이 맞아도 후보에서 빠집니다. (재현율과 지연 시간의 교환)
+    app.config.setdefault('MATCH_REGIONS', json.loads(os.getenv('MATCH_REGIONS', '{}')))
+    # {"지역": ["함께 조회할 이웃 지역", ...]}
+    app.config.setdefault('MATCH_REGION_NEIGHBORS', json.loads(os.getenv('MATCH_REGION_NEIGHBORS', '{}')))
+
+def _configured_region(text, regions):
+    for region, keywords in (regions or {}).items():
+        if any(keyword.lower() in text for keyword in keywords):
+            return region
+    return None
+
+def region_of(location, regions=None):
+    """장소 문자열의 파티션 지역. 설정된 키워드가 없으면 장소의 첫 단어(소문자)를 사용합니다."""
+    text = (location or '').lower()
+    region = _configured_region(text, regions)
+    if region is not None:
+        return region
+    words = text.split()
+    return words[0] if words else ''
+
+def regions_to_search(location, regions=None, neighbors=None):
+    """
+    신고 장소의 지역과 이웃 지역 목록.
+    MATCH_REGIONS가 없거나 장소가 어느 지역 키워드에도 해당하지 않으면 None(전체 파티션)을 반환합니다.
+    (첫 단어 지역은 파티션 분배에만 쓰고 검색 범위를 좁히지 않음: "도서관"과 "중앙도서관 1층"처럼
+    같은 장소가 다른 첫 단어로 적힌 물건을 놓치지 않도록)
+    """
+    region = _configured_region((location or '').lower(), regions)
+    if region is None:
+        return None
+    return [region] + [r for r in (neighbors or {}).get(region, []) if r != region]
+
+def _as_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    return value
+
+def _labels(detection_results):
+    """저장된 감지 결과(JSON 문자열 또는 리스트)의 레이블 집합. info/warning/error 메시지는 무시합니다."""
+    if not detection_results:
+        return frozenset()
+    try:
+        predictions = json.loads(detection_results) if isinstance(detection_results, str) else detection_results
+    except ValueError:
+        return frozenset()
+    if not isinstance(predictions, list):
+        return frozenset()
+    return frozenset(p['label'] for p in predictions if isinstance(p, dict) and 'label' in p)
+
+def make_candidate(item):
+    """매처 프로세스에 보낼 물건의 매칭용 요약 (id, 장소, 설명 단어, 레이블, 등록일)"""
+    return (
+        item.id,
+        (item.location or '').lower(),
+        frozenset((item.description or '').lower().split()),
+        _labels(item.detection_results),
+        _as_date(item.upload_date),
+    )
+
+def make_query(lost_location, item_description, detection_results, lost_date):
+    """신고의 매칭용 요약 (장소, 설명 단어, 레이블, 분실일)"""
+    return (
+        (lost_location or '').lower(),
+        frozenset((item_description or '').lower().split()),
+        _labels(detection_results),
+        _as_date(lost_date),
+    )
+
+def score_candidate(query, candidate):
+    """신고와 물건 하나의 매칭 점수와 근거 목록"""
+    query_location, query_words, query_labels, lost_date = query
+    _, location, words, labels, upload_date = candidate
+    score = 0
+    match_details = []
+
+    # 장소 일치
+    if query_location in location or location in query_location:
+        score += 10
+        match_details.append("장소 일치")
+
+    # 설명 키워드 매칭
+    if query_words & words:
+        score += 5
+        match_details.append("설명 키워드 매칭")
+
+    # AI 감지 특징 일치
+    common_labels = query_labels & labels
+    if common_labels:
+        score += len(common_labels) * 10
+        match_details.append(f"AI 감지 특징 일치: {', '.join(sorted(common_labels))}")
+
+    # 날짜 유사 (7일 이내면 차이가 적을수록 높은 점수)
+    if lost_date and upload_date:
+        days_diff = abs((lost_date - upload_date).days)
+        if days_diff <= 7:
+            score += (7 - days_diff) * 2
+            match_details.append(f"날짜 유사 (차이: {days_diff}일)")
+    return score, match_details
+
+def best_matches(matches, top_k):
+    """점수 내림차순(같으면 물건 id 오름차순) 상위 top_k개 (top_k가 0 이하면 전부)"""
+    key = lambda match: (match[0], -match[1])
+    if top_k <= 0:
+        return sorted(matches, key=key, reverse=True)
+    return heapq.nlargest(top_k, matches, key=key)
+
+def top_matches(query, candidates, top_k, min_score=MIN_MATCH_SCORE):
+    """후보 중 min_score 이상인 상위 top_k개의 (점수, 물건 id, 근거) 목록 (top_k가 0 이하면 전부)"""
+    scored = []
+    for candidate in candidates:
+        score, match_details = score_candidate(query, candidate)
+        if score >= min_score:
+            scored.append((score, candidate[0], match_details))
+    return best_matches(scored, top_k)
+
+class PartitionStore:
+    """지역 -> {물건 id: 후보} 저장소. 매처 프로세스 안(또는 MATCH_WORKERS=0이면 요청 프로세스)에서 사용합니다."""
+
+    def __init__(self):
+        self.partitions = {}
+
+    def apply(self, message):
+        kind = message[0]
+        if kind == 'upsert':
+            for region, candidate in message[1]:
+                self.partitions.setdefault(region, {})[candidate[0]] = candidate
+        elif kind == 'remove':
+            ids = message[1]
+            for partition in self.partitions.values():
+                for item_id in ids:
+                    partition.pop(item_id, None)
+        elif kind == 'reset':
+            self.partitions.clear()
+
+    def match(self, regions, query, top_k):
+        regions = self.partitions.keys() if regions is None else regions
+        candidates = itertools.chain.from_iterable(
+            self.partitions.get(region, {}).values() for region in list(regions))
+        return top_matches(query, candidates, top_k)
+
+def _matcher_main(inbox, outbox):
+    """매처 프로세스: inbox의 메시지를 순서대로 처리하고 match 결과는 outbox로 보냅니다."""
+    from .logging_setup import configure_logging
+
+    configure_logging()  # spawn으로 시작한 프로세스는 부모의 로깅 설정을 물려받지 않음
+    store = PartitionStore()
+    while True:
+        message = inbox.get()
+        if message[0] == 'stop':
+            return
+        if message[0] == 'match':
+            _, request_id, regions, query, top_k = message
+            try:
+                outbox.put((request_id, store.match(regions, query, top_k), None))
+            except Exception as e:
+                outbox.put((request_id, None, repr(e)))
+        else:
+            store.apply(message)
+
+class Matcher:
+    """
+    매칭 코디네이터. DB의 변경분을 담당 파티션에 반영(sync)하고, 신고를 관련 파티션에 뿌린 뒤 결과를 합칩니다.
+    num_workers가 0이면 프로세스 없이 같은 PartitionStore를 요청 프로세스에서 사용합니다.
+    """
+
+    def __init__(self, num_workers):
+        self.num_workers = num_workers
+        self.sync_lock = threading.Lock()
+        self.synced = False
+        self.max_id = 0
+        self.last_updated = None
+        self.count = 0
+        self.regions = {}  # 물건 id -> 지역
+        self.request_ids = itertools.count()
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        if num_workers:
+            self.ctx = multiprocessing.get_context('spawn')
+            self.outbox = self.ctx.Queue()
+            self.inboxes = [None] * num_workers
+            self.processes = [None] * num_workers
+            for worker in range(num_workers):
+                self._start_worker(worker)
+            threading.Thread(target=self._read_results, name='matcher-results', daemon=True).start()
+        else:
+            self.store = PartitionStore()
+
+    def _start_worker(self, worker):
+        self.inboxes[worker] = self.ctx.Queue()
+        self.processes[worker] = self.ctx.Process(target=_matcher_main, args=(self.inboxes[worker], self.outbox),
+                                                  name=f'matcher-{worker}', daemon=True)
+        self.processes[worker].start()
+
+    def _restart_dead_workers(self):
+        """
+        종료된(OOM 등) 매처 프로세스를 다시 시작합니다. 새 프로세스의 파티션은 비어 있으므로
+        모든 파티션을 비우고 이번 sync에서 전체를 다시 읽습니다. (sync_lock 안에서 호출)
+        """
+        dead = [worker for worker, process in enumerate(self.processes) if not process.is_alive()]
+        if not dead:
+            return
+        for worker in dead:
+            logger.warning("Matcher process %s exited (exit code %s), restarting",
+                           self.processes[worker].name, self.processes[worker].exitcode)
+            self._start_worker(worker)
+        self._broadcast(('reset',))
+        self.regions.clear()
+        self.synced = False
+        self.max_id, self.last_updated, self.count = 0, None, 0
+
+    def _worker_for(self, region):
+        return zlib.crc32(region.encode('utf-8')) % self.num_workers
+
+    def _send(self, worker, message):
+        if self.num_workers:
+            self.inboxes[worker].put(message)
+        else:
+            self.store.apply(message)
+
+    def _broadcast(self, message):
+        for worker in range(max(1, self.num_workers)):
+            self._send(worker, message)
+
+    def _read_results(self):
+        while True:
+            request_id, matches, error = self.outbox.get()
+            with self.pending_lock:
+                future = self.pending.pop(request_id, None)
+            if future is None:
+                continue
+            if error is not None:
+                future.set_exception(RuntimeError(f"매처 프로세스 오류: {error}"))
+            else:
+                future.set_result(matches)
+
+    def sync(self):
+        """마지막 sync 이후 추가/수정된 LostItem을 파티션에 반영합니다. 삭제(보관/병합)가 있으면 전체를 다시 읽습니다."""
+        regions_config = current_app.config['MATCH_REGIONS']
+        with self.sync_lock, prefer_replica(db.session):
+            if self.num_workers:
+                self._restart_dead_workers()
+            count = LostItem.query.count()
+            query = db.session.query(*_SYNC_COLUMNS)
+            if self.synced:
+                condition = LostItem.id > self.max_id
+                if self.last_updated is not None:
+                    # 같은 시각에 수정된 행을 놓치지 않도록 경계 시각의 행은 다시 읽습니다.
+                    condition = or_(condition, LostItem.updated_at >= self.last_updated)
+                query = query.filter(condition)
+            changed = query.all()
+            new_rows = sum(1 for item in changed if item.id > self.max_id)
+            if self.synced and count != self.count + new_rows:
+                logger.info("LostItem rows were removed, reloading match partitions")
+                self._broadcast(('reset',))
+                self.regions.clear()
+                changed = db.session.query(*_SYNC_COLUMNS).all()
+            self.count = count
+            self.synced = True
+
+            upserts, removed = {}, []
+            for item in changed:
+                self.max_id = max(self.max_id, item.id)
+                if item.updated_at is not None and (self.last_updated is None or item.updated_at > self.last_updated):
+                    self.last_updated = item.updated_at
+                if item.id in self.regions:
+                    removed.append(item.id)
+                if item.status != 'active':
+                    self.regions.pop(item.id, None)
+                    continue
+                region = region_of(item.location, regions_config)
+                self.regions[item.id] = region
+                upserts.setdefault(self._worker_for(region) if self.num_workers else 0, []).append(
+                    (region, make_candidate(item)))
+            if removed:
+                self._broadcast(('remove', removed))
+            for worker, rows in upserts.items():
+                self._send(worker, ('upsert', rows))
+            if changed:
+                logger.debug("Match partitions synced: %d changed rows", len(changed))
+
+    def match(self, query, regions, top_k, timeout=None):
+        """
+        regions(None이면 전체) 파티션에서 query와 가장 잘 맞는 top_k개의 (점수, 물건 id, 근거) 목록과
+        모든 매처가 제때 응답했는지 여부를 반환합니다. 응답하지 않거나 오류가 난 매처의 파티션은 빠진 부분 결과입니다.
+        """
+        if not self.num_workers:
+            with self.sync_lock:
+                return self.store.match(regions, query, top_k), True
+
+        if regions is None:
+            targets = {worker: None for worker in range(self.num_workers)}
+        else:
+            targets = {}
+            for region in regions:
+                targets.setdefault(self._worker_for(region), []).append(region)
+
+        requests = []
+        for worker, worker_regions in targets.items():
+            request_id = next(self.request_ids)
+            future = Future()
+            with self.pending_lock:
+                self.pending[request_id] = future
+            requests.append((worker, request_id, future))
+            self._send(worker, ('match', request_id, worker_regions, query, top_k))
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        partial, complete = [], True
+        for worker, request_id, future in requests:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                partial.extend(future.result(timeout=remaining))
+            except FutureTimeoutError:
+                complete = False
+                with self.pending_lock:
+                    self.pending.pop(request_id, None)
+                process = self.processes[worker]
+                # 죽은 프로세스는 다음 sync에서 다시 시작합니다.
+                logger.warning("Matcher %s timed out (alive: %s), returning partial matches",
+                               process.name, process.is_alive())
+            except Exception as e:
+                complete = False
+                logger.warning("Matcher %s failed, returning partial matches: %s", self.processes[worker].name, e)
+        return best_matches(partial, top_k), complete
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+def get_matcher():
+    """프로세스 공용 매칭 코디네이터 (처음 호출될 때 매처 프로세스를 시작합니다)"""
+    global _matcher
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                _matcher = Matcher(current_app.config['MATCH_WORKERS'])
+    return _matcher
+
+def find_matches(query, lost_location, extra_candidates=()):
+    """
+    매칭 상위 MATCH_TOP_K개(0이면 기준 점수 이상 전부)와 모든 파티션의 결과가 포함되었는지 여부를 반환합니다.
+    MATCH_REGIONS가 설정되어 있으면 신고 장소의 지역과 이웃 지역 파티션만, 아니면 전체 파티션을 조회합니다.
+    extra_candidates(보관된 물건 등 파티션에 없는 후보)는 요청 스레드에서 함께 점수를 매겨 합칩니다.
+    """
+    config = current_app.config
+    top_k = config['MATCH_TOP_K']
+    regions = regions_to_search(lost_location, config['MATCH_REGIONS'], config['MATCH_REGION_NEIGHBORS'])
+
+    matcher = get_matcher()
+    matcher.sync()
+    matches, complete = matcher.match(query, regions, top_k, timeout=config['MATCH_TIMEOUT'])
+    if extra_candidates:
+        matches = best_matches(matches + top_matches(query, extra_candidates, top_k), top_k)
+    return matches, complete
@@ -1,52 +1,64 @@
 # my_backend_utils.py
-import torch
+import os
 import numpy as np
-from PIL import Image
-
-def preprocess_image(image):
-    """YOLOv5 모델의 입력에 맞게 이미지를 전처리합니다."""
-    try:
-        # 이미지 크기 조정 및 리샘플링
-        image = image.resize((640, 640), Image.BILINEAR)
-
-        # 이미지를 NumPy 배열로 변환
-        img_array = np.array(image)
-
-        # 이미지를 PyTorch 텐서로 변환
-        img_tensor = torch.tensor(img_array).float()
-        img_tensor /= 255.0  # 정규화
-
-        # 차원 변경 (HWC -> BCHW)
-        img_tensor = img_tensor.permute(2, 0, 1).unsqueeze(0)
-
-        return img_tensor
-
-    except Exception as e:
-        print(f"Error during image preprocessing: {e}")
-        return None
-
-def postprocess_detections(results, image_width, image_height):
-    """YOLOv5 모델의 출력 결과를 후처리하여 Bounding Box 좌표를 변환합니다."""
-    try:
-        # results에서 감지된 객체 정보 추출
-        detections = []
-        for *xyxy, conf, cls in results.xyxy[0]:
-            # Bounding Box 좌표 추출 및 이미지 크기에 맞게 조정
-            x1, y1, x2, y2 = map(float, xyxy)
-            x1 = (x1 / 640) * image_width
-            y1 = (y1 / 640) * image_height
-            x2 = (x2 / 640) * image_width
-            y2 = (y2 / 640) * image_height
-
-            # 객체 정보 딕셔너리 생성
-            obj = {
-                'box': {'x': x1, 'y': y1, 'width': x2 - x1, 'height': y2 - y1},
-                'confidence': float(conf),
-                'label': results.names[int(cls)],  # 클래스 이름
-            }
-            detections.append(obj)
-        return detections
-
-    except Exception as e:
-        print(f"Error during postprocessing: {e}")
-        return []
\ No newline at end of file
+from flask import current_app
+
+# 허용된 파일 확장자
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+# 감지 박스 좌표/신뢰도를 반올림할 소수 자릿수 (비우면 반올림하지 않음). 응답과 저장되는 JSON 크기를 줄입니다.
+DETECTION_BOX_DECIMALS = int(os.getenv('DETECTION_BOX_DECIMALS')) if os.getenv('DETECTION_BOX_DECIMALS') else None
+
+def allowed_file(filename):
+    return '.' in filename and \
+           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def get_upload_directory():
+    return os.path.join(current_app.root_path, current_app.config['UPLOAD_FOLDER'])
+
+def decode_detections(results, conf_threshold=0.0, classes=None, scales=None):
+    """
+    YOLOv5 결과의 xyxy 텐서를 이미지별 감지 목록으로 변환합니다. (pandas를 사용하지 않고 NumPy로 한 번에 처리)
+    모든 감지 라우트가 이 형식을 사용합니다:
+        [{'box': {'x', 'y', 'width', 'height'}, 'confidence': float, 'label': str}, ...]
+
+    conf_threshold: 이 값보다 낮은 신뢰도의 박스는 제외
+    classes: 남길 클래스 이름 목록 (None이면 전체)
+    scales: 이미지별 (x 배율, y 배율) 목록 (None이면 좌표를 그대로 사용)
+    """
+    names = results.names
+    name_array = np.array([names[i] for i in range(len(names))], dtype=object)
+    class_ids = None
+    if classes:
+        class_ids = np.flatnonzero(np.isin(name_array, list(classes)))
+
+    decoded = []
+    for index, xyxy in enumerate(results.xyxy):
+        rows = xyxy.detach().cpu().numpy() if hasattr(xyxy, 'detach') else np.asarray(xyxy)
+        if rows.size == 0:
+            decoded.append([])
+            continue
+
+        cls = rows[:, 5].astype(np.int64)
+        keep = rows[:, 4] >= conf_threshold
+        if class_ids is not None:
+            keep &= np.isin(cls, class_ids)
+        rows, cls = rows[keep], cls[keep]
+
+        boxes = rows[:, :4].astype(np.float64)
+        if scales is not None:
+            scale_x, scale_y = scales[index]
+            boxes *= np.array([scale_x, scale_y, scale_x, scale_y])
+        sizes = boxes[:, 2:4] - boxes[:, 0:2]
+        confidences = rows[:, 4].astype(np.float64)
+        if DETECTION_BOX_DECIMALS is not None:
+            boxes = boxes.round(DETECTION_BOX_DECIMALS)
+            sizes = sizes.round(DETECTION_BOX_DECIMALS)
+            confidences = confidences.round(DETECTION_BOX_DECIMALS)
+
+        decoded.append([
+            {'box': {'x': x, 'y': y, 'width': w, 'height': h}, 'confidence': conf, 'label': label}
+            for x, y, w, h, conf, label in zip(
+                boxes[:, 0].tolist(), boxes[:, 1].tolist(), sizes[:, 0].tolist(), sizes[:, 1].tolist(),
+                confidences.tolist(), name_array[cls].tolist())
+        ])
+    return decoded
@@ -1,26 +1,30 @@
 # my_models.py
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
 import datetime
 import json
 
-db = SQLAlchemy()
+from .db_routing import RoutingSession
+from . import passwords
+
+# 읽기 전용 쿼리는 복제본(SQLALCHEMY_BINDS['replica'])으로 보내는 세션을 사용합니다.
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(255))  # scrypt 해시는 약 160자
     is_admin = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.datetime.now)
     lost_items = db.relationship('LostItem', backref='user', lazy=True)
     lost_reports = db.relationship('LostReport', backref='user', lazy=True)
 
+    # 해시 계산은 passwords 모듈의 워커 풀에서 실행됩니다. (대기열이 가득 차면 PasswordPoolBusy)
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = passwords.hash_password(password)
 
     def verify_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return passwords.verify_password(self.password_hash, password)
 
     def to_dict(self):
         return {
@@ -38,8 +42,44 @@ class LostItem(db.Model):
     location = db.Column(db.String(255), nullable=False)
     upload_date = db.Column(db.DateTime, default=datetime.datetime.now)
     created_at = db.Column(db.DateTime, default=datetime.datetime.now)
+    # 목록 응답의 ETag/Last-Modified 계산용 (추가/수정 시각)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.now, onupdate=datetime.datetime.now, index=True)
     detection_results = db.Column(db.JSON, nullable=True)  # YOLO 감지 결과 (JSON 형식)
     feature_vector = db.Column(db.JSON, nullable=True)     # AI 특징 벡터 (JSON 형식)
+    phash = db.Column(db.String(16), nullable=True, index=True)  # 근접 중복 탐지용 64비트 pHash (16진수)
+    # 수명 주기: active(매칭 대상) -> claimed(주인이 찾아감). 오래되었거나 claimed인 행은 ArchivedLostItem으로 옮겨집니다.
+    status = db.Column(db.String(20), nullable=False, default='active', server_default='active', index=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    object_embeddings = db.relationship('ObjectEmbedding', backref='lost_item', lazy=True, cascade='all, delete-orphan')
+
+class ArchivedLostItem(db.Model):
+    """
+    LostItem에서 옮겨진 오래된/주인이 찾아간 물건 (cold 파티션).
+    기본 목록/매칭에서는 조회하지 않고 include_archived를 지정한 경우에만 함께 조회합니다.
+    """
+    id = db.Column(db.Integer, primary_key=True)           # 원래 LostItem.id를 그대로 사용
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    image_url = db.Column(db.String(255), nullable=False)
+    description = db.Column(db.String(500), nullable=False)
+    location = db.Column(db.String(255), nullable=False)
+    upload_date = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    detection_results = db.Column(db.JSON, nullable=True)
+    feature_vector = db.Column(db.JSON, nullable=True)
+    phash = db.Column(db.String(16), nullable=True)
+    status = db.Column(db.String(20), nullable=False)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, default=datetime.datetime.now, index=True)
+
+class ObjectEmbedding(db.Model):
+    """YOLO로 감지한 객체 하나를 잘라낸 이미지의 특징 벡터"""
+    id = db.Column(db.Integer, primary_key=True)
+    lost_item_id = db.Column(db.Integer, db.ForeignKey('lost_item.id'), nullable=False, index=True)
+    label = db.Column(db.String(80), nullable=False, index=True)
+    confidence = db.Column(db.Float, nullable=False)
+    box = db.Column(db.JSON, nullable=False)               # {'x', 'y', 'width', 'height'}
+    feature_vector = db.Column(db.JSON, nullable=False)    # 크롭 이미지의 AI 특징 벡터
 
 class LostReport(db.Model):
     id = db.Column(db.Integer, primary_key=True)
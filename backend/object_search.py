@@ -0,0 +1,136 @@
+# object_search.py
+import logging
+
+import numpy as np
+from flask import Blueprint, request, jsonify
+
+from .my_models import db, LostItem, ObjectEmbedding
+from .db_routing import prefer_replica
+from .lifecycle import STATUS_ACTIVE
+from .auth import token_required
+from .admission import inference_admission
+from .upload_guard import UploadRejected, inspect_upload, open_image
+from . import inference
+
+object_search_bp = Blueprint('object_search', __name__, url_prefix='/api')
+logger = logging.getLogger(__name__)
+
+def object_embedding_rows(lost_item_id, object_features):
+    """extract_object_features 결과를 ObjectEmbedding bulk_insert_mappings용 딕셔너리 목록으로 바꿉니다."""
+    return [{
+        'lost_item_id': lost_item_id,
+        'label': detection['label'],
+        'confidence': detection['confidence'],
+        'box': detection['box'],
+        'feature_vector': vector,
+    } for detection, vector in object_features]
+
+def _normalized(vectors):
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+def load_object_candidates(labels=None):
+    """
+    검색 대상 객체 임베딩을 쿼리 한 번으로 읽어 레이블별 (행 목록, 정규화된 벡터 행렬)로 묶습니다.
+    labels가 None이면 모든 레이블을 읽습니다. 요청당 한 번 만들어 감지된 객체마다 재사용합니다.
+    """
+    # 주인이 찾아간(claimed) 물건의 객체는 제외합니다. (보관된 물건의 객체 임베딩은 보관 시 삭제됨)
+    query = db.session.query(ObjectEmbedding.id, ObjectEmbedding.lost_item_id, ObjectEmbedding.label,
+                             ObjectEmbedding.box, ObjectEmbedding.feature_vector) \
+        .join(LostItem, LostItem.id == ObjectEmbedding.lost_item_id) \
+        .filter(LostItem.status == STATUS_ACTIVE)
+    if labels is not None:
+        query = query.filter(ObjectEmbedding.label.in_(list(labels)))
+    with prefer_replica(db.session):
+        rows = query.all()
+
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row.label, []).append(row)
+    return {label: (members, _normalized([row.feature_vector for row in members]))
+            for label, members in grouped.items()}
+
+def search_similar_objects(query_vector, label=None, top_k=10, candidates=None):
+    """
+    객체 임베딩 중 query_vector와 코사인 유사도가 높은 순으로 top_k개를 반환합니다.
+    label이 주어지면 같은 레이블의 객체만 비교합니다.
+    candidates: load_object_candidates 결과 (없으면 이 호출에서 읽음)
+    """
+    if candidates is None:
+        candidates = load_object_candidates([label] if label else None)
+    if label:
+        groups = [candidates[label]] if label in candidates else []
+    else:
+        groups = list(candidates.values())
+    if not groups:
+        return []
+
+    rows = [row for members, _ in groups for row in members]
+    matrix = groups[0][1] if len(groups) == 1 else np.vstack([matrix for _, matrix in groups])
+    similarities = matrix @ _normalized(np.asarray(query_vector, dtype=np.float32).ravel())
+    order = np.argsort(-similarities)[:top_k]
+    return [(rows[i], float(similarities[i])) for i in order]
+
+# ====================================================================
+# 객체 단위 유사 물건 검색
+@object_search_bp.route('/search_objects', methods=['POST'])
+@token_required
+@inference_admission()
+def search_objects(current_user):
+    image_file = request.files.get('image')
+    if not image_file or image_file.filename == '':
+        return jsonify({'error': '이미지 파일이 필요합니다.'}), 400
+    try:
+        top_k = int(request.form.get('top_k', 10))
+    except ValueError:
+        return jsonify({'error': 'top_k는 정수여야 합니다.'}), 400
+    label_filter = request.form.get('label')
+    try:
+        inspect_upload(image_file)
+    except UploadRejected as e:
+        return jsonify({'error': e.message}), e.status_code
+
+    yolo_model = inference.get_detection_model()
+    embedder = inference.get_embedding_model()
+    if yolo_model is None or embedder is None:
+        return jsonify({'error': 'AI 모델이 백엔드에 로드되지 않았습니다.'}), 503
+
+    image = open_image(image_file.stream)
+    detections = inference.detect_batch(yolo_model, [image])[0]
+    if label_filter:
+        detections = [d for d in detections if d['label'] == label_filter]
+    object_features = inference.extract_object_features_batch(embedder, [image], [detections])[0]
+
+    # 객체가 없으면 이미지 전체로 검색합니다.
+    if not object_features:
+        whole_image = inference.extract_features_batch(embedder, [image])[0]
+        object_features = [({'label': label_filter, 'confidence': None, 'box': None}, whole_image)]
+
+    # 후보는 감지된 레이블들에 대해 한 번만 읽고, 물건별로 가장 높은 객체 유사도를 사용합니다.
+    labels = {detection['label'] for detection, _ in object_features}
+    candidates = load_object_candidates(None if None in labels else labels)
+    best_by_item = {}
+    for detection, vector in object_features:
+        for candidate, similarity in search_similar_objects(vector, detection['label'], top_k, candidates):
+            best = best_by_item.get(candidate.lost_item_id)
+            if best is None or similarity > best['similarity']:
+                best_by_item[candidate.lost_item_id] = {
+                    'item_id': candidate.lost_item_id,
+                    'similarity': similarity,
+                    'label': candidate.label,
+                    'box': candidate.box,
+                    'query_label': detection['label'],
+                }
+
+    matches = sorted(best_by_item.values(), key=lambda m: m['similarity'], reverse=True)[:top_k]
+    items = {item.id: item for item in LostItem.query.filter(LostItem.id.in_([m['item_id'] for m in matches])).all()}
+    for match in matches:
+        item = items.get(match['item_id'])
+        if item is not None:
+            match.update({'imageUrl': item.image_url, 'description': item.description, 'location': item.location})
+
+    return jsonify({
+        'query_objects': [detection for detection, _ in object_features],
+        'matches': matches,
+    }), 200
@@ -0,0 +1,218 @@
+# passwords.py
+# 비밀번호 해시/검증을 요청 스레드 대신 크기가 제한된 워커 풀에서 실행합니다.
+# 로그인이 몰려도 해시 계산(scrypt/PBKDF2)에 쓰이는 CPU와 메모리가 PASSWORD_HASH_WORKERS개로 묶이므로
+# 같은 워커 프로세스의 추론 요청이 밀리지 않고, 대기열이 가득 차면 503으로 바로 거절합니다.
+# 로그인 실패는 사용자/IP별로 세어 한도를 넘으면 해시 계산 전에 429로 막습니다.
+import os
+import time
+import logging
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from collections import deque, OrderedDict
+
+import click
+from flask import current_app, jsonify
+from flask.cli import with_appcontext
+from werkzeug.security import generate_password_hash, check_password_hash
+
+logger = logging.getLogger(__name__)
+
+# 프로세스당 실패 기록을 보관할 최대 키(사용자/IP) 수
+LOGIN_FAILURE_MAX_KEYS = int(os.getenv('LOGIN_FAILURE_MAX_KEYS', 100000))
+
+class PasswordPoolBusy(Exception):
+    """해시 워커 풀의 대기열이 가득 찼거나 제한 시간 안에 끝나지 않은 경우"""
+
+def configure_passwords(app):
+    """앱 설정에 비밀번호 해시/로그인 제한 기본값을 채웁니다."""
+    # werkzeug generate_password_hash의 method 문자열 (비용 인자까지 모두 적어야 rehash 판단이 정확합니다)
+    # 예: 'scrypt:32768:8:1', 'pbkdf2:sha256:600000'
+    app.config.setdefault('PASSWORD_HASH_METHOD', os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1'))
+    app.config.setdefault('PASSWORD_HASH_WORKERS', int(os.getenv('PASSWORD_HASH_WORKERS', 2)))
+    app.config.setdefault('PASSWORD_HASH_QUEUE', int(os.getenv('PASSWORD_HASH_QUEUE', 32)))
+    app.config.setdefault('PASSWORD_HASH_TIMEOUT', float(os.getenv('PASSWORD_HASH_TIMEOUT', 5.0)))
+    app.config.setdefault('LOGIN_MAX_FAILURES_PER_USER', int(os.getenv('LOGIN_MAX_FAILURES_PER_USER', 5)))
+    app.config.setdefault('LOGIN_MAX_FAILURES_PER_IP', int(os.getenv('LOGIN_MAX_FAILURES_PER_IP', 20)))
+    app.config.setdefault('LOGIN_FAILURE_WINDOW', int(os.getenv('LOGIN_FAILURE_WINDOW', 900)))
+
+class HashPool:
+    """스레드 수와 대기열 길이가 제한된 해시 워커 풀 (hashlib의 scrypt/pbkdf2는 GIL을 풀고 계산합니다)"""
+
+    def __init__(self, workers, max_queue):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self.slots = threading.BoundedSemaphore(workers + max_queue)
+
+    def run(self, fn, *args, timeout):
+        if not self.slots.acquire(blocking=False):
+            raise PasswordPoolBusy('password hash queue is full')
+        try:
+            future = self.executor.submit(fn, *args)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise PasswordPoolBusy('password hash timed out')
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_hash_pool():
+    """프로세스 공용 해시 워커 풀 (처음 호출될 때 생성)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                config = current_app.config
+                _pool = HashPool(config['PASSWORD_HASH_WORKERS'], config['PASSWORD_HASH_QUEUE'])
+    return _pool
+
+def hash_password(password):
+    """설정된 알고리즘/비용으로 해시를 만듭니다."""
+    method = current_app.config['PASSWORD_HASH_METHOD']
+    return get_hash_pool().run(generate_password_hash, password, method,
+                               timeout=current_app.config['PASSWORD_HASH_TIMEOUT'])
+
+def verify_password(password_hash, password):
+    if not password_hash or not password:
+        return False
+    return get_hash_pool().run(check_password_hash, password_hash, password,
+                               timeout=current_app.config['PASSWORD_HASH_TIMEOUT'])
+
+def needs_rehash(password_hash):
+    """저장된 해시의 method가 현재 PASSWORD_HASH_METHOD와 다르면 True"""
+    return password_hash.split('$', 1)[0] != current_app.config['PASSWORD_HASH_METHOD']
+
+def busy_response():
+    response = jsonify({'error': '로그인 요청이 많아 잠시 후 다시 시도해주세요.'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+# ====================================================================
+# 로그인 실패 제한
+
+class FailureLimiter:
+    """
+    키(사용자/IP)별 최근 window초 동안의 실패 시각을 보관하는 슬라이딩 윈도 카운터 (프로세스 단위).
+    키는 마지막 실패 순서로 유지해 기록할 때마다 앞쪽의 만료된 키를 지우고, max_keys를 넘으면 가장 오래된 키부터 버립니다.
+    (무작위 아이디로 시도하는 credential stuffing에도 메모리가 한도 안에 머무름)
+    """
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self.failures = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _prune(self, key, now, window):
+        attempts = self.failures.get(key)
+        if attempts is None:
+            return None
+        while attempts and now - attempts[0] >= window:
+            attempts.popleft()
+        if not attempts:
+            del self.failures[key]
+            return None
+        return attempts
+
+    def _sweep(self, now, window):
+        while self.failures:
+            key, attempts = next(iter(self.failures.items()))
+            if now - attempts[-1] < window and len(self.failures) <= self.max_keys:
+                return
+            del self.failures[key]
+
+    def retry_after(self, key, limit, window):
+        """한도를 넘었으면 다시 시도할 수 있을 때까지 남은 초, 아니면 0"""
+        now = time.monotonic()
+        with self.lock:
+            attempts = self._prune(key, now, window)
+            if attempts is None or len(attempts) < limit:
+                return 0
+            return int(window - (now - attempts[-limit])) + 1
+
+    def record(self, key, window):
+        now = time.monotonic()
+        with self.lock:
+            attempts = self._prune(key, now, window)
+            if attempts is None:
+                attempts = self.failures[key] = deque()
+            else:
+                self.failures.move_to_end(key)
+            attempts.append(now)
+            self._sweep(now, window)
+
+    def reset(self, key):
+        with self.lock:
+            self.failures.pop(key, None)
+
+_failures = FailureLimiter(LOGIN_FAILURE_MAX_KEYS)
+
+def _limits(username, remote_addr):
+    config = current_app.config
+    return [
+        (f'user:{username}', config['LOGIN_MAX_FAILURES_PER_USER']),
+        (f'ip:{remote_addr}', config['LOGIN_MAX_FAILURES_PER_IP']),
+    ]
+
+def login_blocked(username, remote_addr):
+    """사용자나 IP의 실패 횟수가 한도를 넘었으면 남은 초를 반환합니다. (해시 계산 전에 확인)"""
+    window = current_app.config['LOGIN_FAILURE_WINDOW']
+    return max(_failures.retry_after(key, limit, window) for key, limit in _limits(username, remote_addr))
+
+def record_login_failure(username, remote_addr):
+    window = current_app.config['LOGIN_FAILURE_WINDOW']
+    for key, _ in _limits(username, remote_addr):
+        _failures.record(key, window)
+
+def record_login_success(username):
+    _failures.reset(f'user:{username}')
+
+def blocked_response(retry_after):
+    response = jsonify({'error': '로그인 실패가 많아 잠시 후 다시 시도해주세요.', 'retry_after': retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+# ====================================================================
+# flask login-benchmark CLI (동시 로그인 지연 시간 측정)
+
+@click.command('login-benchmark')
+@click.option('--username', required=True, help='측정에 쓸 계정 아이디')
+@click.option('--password', required=True, help='측정에 쓸 계정 비밀번호')
+@click.option('--path', default='/api/auth/login', help='로그인 API 경로 (관리자 계정은 /api/auth/admin-login)')
+@click.option('--admin-code', default=None, help='관리자 로그인 코드')
+@click.option('--concurrency', type=int, default=16, help='동시 요청 스레드 수')
+@click.option('--requests', 'num_requests', type=int, default=200, help='전체 요청 수')
+@with_appcontext
+def login_benchmark_command(username, password, path, admin_code, concurrency, num_requests):
+    """test client로 동시에 로그인해 p50/p95/p99 지연 시간과 상태 코드 분포를 출력합니다."""
+    app = current_app._get_current_object()
+    payload = {'username': username, 'password': password}
+    if admin_code:
+        payload['admin_code'] = admin_code
+
+    def one_login(_):
+        client = app.test_client()
+        start = time.perf_counter()
+        response = client.post(path, json=payload)
+        return (time.perf_counter() - start) * 1000, response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one_login, range(num_requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in results)
+    codes = {}
+    for _, status in results:
+        codes[status] = codes.get(status, 0) + 1
+    percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    click.echo(f"method={app.config['PASSWORD_HASH_METHOD']} workers={app.config['PASSWORD_HASH_WORKERS']} "
+               f"concurrency={concurrency} requests={num_requests} throughput={num_requests / elapsed:.1f}/s")
+    click.echo(f"p50={percentiles[49]:.1f}ms p95={percentiles[94]:.1f}ms p99={percentiles[98]:.1f}ms "
+               f"max={latencies[-1]:.1f}ms status={codes}")
@@ -0,0 +1,249 @@
+# profiling.py
+# 운영 중인 요청을 골라 프로파일링합니다. 관리자가 X-Profile 헤더를 보낸 요청이나
+# PROFILING_SAMPLE_RATE 비율로 뽑힌 요청만 프로파일러로 감싸고, 결과는 PROFILE_DIR에 최근 PROFILE_MAX_COUNT개만 남깁니다.
+#   X-Profile: sample  요청 스레드의 스택을 주기적으로 수집한 folded stack (flamegraph.pl/speedscope 입력)
+#   X-Profile: pstats  cProfile 결과 (python -m pstats, snakeviz 등으로 확인)
+#   X-Profile: torch   sample + YOLO/ResNet 단계의 torch profiler chrome trace (chrome://tracing, Perfetto)
+# 프로파일링하지 않는 요청은 헤더 확인(과 샘플링 비율이 0보다 크면 난수 하나)만 하므로 추가 비용이 거의 없습니다.
+import os
+import sys
+import time
+import json
+import uuid
+import random
+import logging
+import cProfile
+import threading
+import contextlib
+from collections import Counter
+
+import jwt
+from flask import Blueprint, request, jsonify, current_app, g, send_from_directory
+
+from .auth import admin_required
+from .my_models import db, User
+
+profiling_bp = Blueprint('profiling', __name__, url_prefix='/api/admin')
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_MODES = ('sample', 'pstats', 'torch')
+
+def configure_profiling(app):
+    """앱 설정에 프로파일링 기본값을 채웁니다."""
+    app.config.setdefault('PROFILE_DIR', os.getenv('PROFILE_DIR', os.path.join(app.root_path, 'profiles')))
+    app.config.setdefault('PROFILE_MAX_COUNT', int(os.getenv('PROFILE_MAX_COUNT', 50)))
+    # 헤더 없이 무작위로 프로파일링할 요청 비율 (0이면 끔, sample 모드로 실행)
+    app.config.setdefault('PROFILING_SAMPLE_RATE', float(os.getenv('PROFILING_SAMPLE_RATE', 0)))
+    # sample 모드의 스택 수집 간격 (초)
+    app.config.setdefault('PROFILING_INTERVAL', float(os.getenv('PROFILING_INTERVAL', 0.005)))
+
+# ====================================================================
+# 프로파일러
+
+class StackSampler:
+    """대상 스레드의 파이썬 스택을 interval초마다 읽어 folded stack별 샘플 수를 세는 통계 프로파일러"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.counts[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+        return sum(self.counts.values())
+
+# torch profiler가 켜진 스레드 (inference의 profile_stage가 확인)
+_torch_local = threading.local()
+
+def profile_stage(name):
+    """
+    추론 단계(YOLO 감지, ResNet 임베딩 등)를 torch profiler에 이름 붙은 구간으로 기록합니다.
+    현재 스레드에서 torch 프로파일링 중이 아니면 아무것도 하지 않는 컨텍스트를 반환합니다.
+    """
+    if not getattr(_torch_local, 'active', False):
+        return contextlib.nullcontext()
+    from torch.profiler import record_function
+    return record_function(name)
+
+class RequestProfile:
+    """요청 하나의 프로파일링 상태 (mode에 따라 샘플러/cProfile/torch profiler를 켜고 끔)"""
+
+    def __init__(self, mode, interval):
+        self.mode = mode
+        self.profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.sampler = None
+        self.cprofile = None
+        self.torch_profiler = None
+        self.started = time.perf_counter()
+        self.status_code = None
+        if mode == 'pstats':
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+        else:
+            self.sampler = StackSampler(threading.get_ident(), interval)
+            self.sampler.start()
+        if mode == 'torch':
+            import torch
+            from torch.profiler import profile, ProfilerActivity
+
+            activities = [ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(ProfilerActivity.CUDA)
+            self.torch_profiler = profile(activities=activities, record_shapes=True)
+            self.torch_profiler.__enter__()
+            _torch_local.active = True
+
+    def finish(self, profile_dir):
+        """프로파일러를 멈추고 결과 파일과 메타데이터(JSON)를 profile_dir에 저장한 뒤 메타데이터를 반환합니다."""
+        duration_ms = (time.perf_counter() - self.started) * 1000
+        files = []
+        meta = {
+            'id': self.profile_id,
+            'mode': self.mode,
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': self.status_code,
+            'duration_ms': round(duration_ms, 1),
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        os.makedirs(profile_dir, exist_ok=True)
+        if self.torch_profiler is not None:
+            _torch_local.active = False
+            self.torch_profiler.__exit__(None, None, None)
+            name = f"{self.profile_id}.torch.json"
+            self.torch_profiler.export_chrome_trace(os.path.join(profile_dir, name))
+            files.append(name)
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            name = f"{self.profile_id}.prof"
+            self.cprofile.dump_stats(os.path.join(profile_dir, name))
+            files.append(name)
+        if self.sampler is not None:
+            self.sampler.stop()
+            name = f"{self.profile_id}.folded"
+            meta['samples'] = self.sampler.save(os.path.join(profile_dir, name))
+            files.append(name)
+        meta['files'] = files
+        with open(os.path.join(profile_dir, f"{self.profile_id}.meta.json"), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        return meta
+
+# ====================================================================
+# 요청 훅
+
+def _requested_mode():
+    """관리자 토큰과 함께 보낸 X-Profile 헤더의 모드 (관리자가 아니거나 모드가 잘못되면 None)"""
+    mode = request.headers.get(PROFILE_HEADER, '').strip().lower()
+    if mode in ('1', 'true', 'yes'):
+        mode = 'sample'
+    if mode not in PROFILE_MODES:
+        return None
+    try:
+        token = request.headers.get('Authorization', '').split(' ')[1]
+        data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
+    except (IndexError, jwt.InvalidTokenError):
+        return None
+    user_id = data.get('user_id')
+    user = db.session.get(User, user_id) if user_id is not None else None
+    return mode if user is not None and user.is_admin else None
+
+def _start_profile():
+    mode = None
+    if PROFILE_HEADER in request.headers:
+        mode = _requested_mode()
+    if mode is None:
+        rate = current_app.config['PROFILING_SAMPLE_RATE']
+        if rate <= 0 or random.random() >= rate:
+            return
+        mode = 'sample'
+    g.request_profile = RequestProfile(mode, current_app.config['PROFILING_INTERVAL'])
+
+def _record_status(response):
+    profile = g.get('request_profile')
+    if profile is not None:
+        profile.status_code = response.status_code
+        response.headers['X-Profile-Id'] = profile.profile_id
+    return response
+
+def _finish_profile(exc):
+    profile = g.pop('request_profile', None)
+    if profile is None:
+        return
+    profile_dir = current_app.config['PROFILE_DIR']
+    try:
+        meta = profile.finish(profile_dir)
+        rotate_profiles(profile_dir, current_app.config['PROFILE_MAX_COUNT'])
+        logger.info("Saved %s profile %s for %s %s (%.1fms)",
+                    meta['mode'], meta['id'], meta['method'], meta['path'], meta['duration_ms'])
+    except Exception as e:  # 프로파일 저장 실패가 요청 처리에 영향을 주지 않도록
+        logger.warning("Failed to save profile %s: %s", profile.profile_id, e)
+
+def init_profiling(app):
+    """요청 전후 훅을 등록합니다."""
+    app.before_request(_start_profile)
+    app.after_request(_record_status)
+    app.teardown_request(_finish_profile)
+
+# ====================================================================
+# 저장된 프로파일 관리
+
+def _list_meta(profile_dir):
+    """profile_dir의 메타데이터를 최신순으로 반환합니다."""
+    if not os.path.isdir(profile_dir):
+        return []
+    metas = []
+    for name in os.listdir(profile_dir):
+        if not name.endswith('.meta.json'):
+            continue
+        try:
+            with open(os.path.join(profile_dir, name), encoding='utf-8') as f:
+                metas.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    metas.sort(key=lambda meta: meta['id'], reverse=True)
+    return metas
+
+def rotate_profiles(profile_dir, max_count):
+    """최신 max_count개의 프로파일만 남기고 나머지 파일을 지웁니다."""
+    for meta in _list_meta(profile_dir)[max_count:]:
+        for name in meta.get('files', []) + [f"{meta['id']}.meta.json"]:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(profile_dir, name))
+
+# 관리자 - 최근 프로파일 목록
+@profiling_bp.route('/profiles', methods=['GET'])
+@admin_required
+def list_profiles(current_user):
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify({'profiles': _list_meta(current_app.config['PROFILE_DIR'])[:limit]}), 200
+
+# 관리자 - 프로파일 파일 다운로드
+@profiling_bp.route('/profiles/<path:filename>', methods=['GET'])
+@admin_required
+def download_profile(current_user, filename):
+    return send_from_directory(current_app.config['PROFILE_DIR'], filename, as_attachment=True)
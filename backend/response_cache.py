@@ -0,0 +1,92 @@
+# response_cache.py
+# 목록 API의 조건부 GET(ETag/Last-Modified → 304)과 직렬화된 응답 본문의 프로세스 내 LRU 캐시.
+# 버전은 목록 쿼리 범위의 (행 수, 최대 id, 최대 updated_at)으로 계산하므로 다른 워커 프로세스에서
+# 추가/수정/삭제된 경우에도 버전이 바뀌어 오래된 캐시가 쓰이지 않습니다.
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from flask import request, current_app
+from sqlalchemy import event, func
+
+from .my_models import db, LostItem
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 256))
+
+class LRUCache:
+    """스레드 안전한 최소 LRU 캐시"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+_body_cache = LRUCache(RESPONSE_CACHE_SIZE)
+
+def _invalidate(mapper, connection, target):
+    _body_cache.clear()
+
+# 이 프로세스에서 LostItem이 추가/수정/삭제되면 캐시를 비웁니다. (다른 프로세스의 변경은 버전 비교로 걸러짐)
+for _event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(LostItem, _event_name, _invalidate)
+
+def lost_item_version(*criteria):
+    """criteria 범위의 LostItem (행 수, 최대 id, 최대 updated_at)"""
+    return db.session.query(
+        func.count(LostItem.id), func.max(LostItem.id), func.max(LostItem.updated_at)
+    ).filter(*criteria).one()
+
+def cached_listing(cache_key, criteria, build):
+    """
+    LostItem 목록 응답을 조건부 GET과 본문 캐시로 감싸 반환합니다.
+
+    cache_key: 라우트/사용자를 구분하는 키 (쿼리 문자열은 자동으로 포함)
+    criteria: 목록 쿼리의 filter 조건 목록 (버전 계산에 사용)
+    build: 캐시가 없을 때 JSON으로 직렬화할 응답 데이터를 만드는 함수
+    """
+    count, max_id, last_modified = lost_item_version(*criteria)
+    key = (cache_key, request.query_string, count, max_id, last_modified)
+    etag = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+    # 삭제는 최대 updated_at을 바꾸지 않으므로 If-Modified-Since만으로는 304를 주지 않고 ETag로만 판단합니다.
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        body = _body_cache.get(key)
+        if body is None:
+            body = current_app.json.dumps(build())
+            _body_cache.put(key, body)
+        else:
+            logger.debug("Listing cache hit: %s", cache_key)
+        response = current_app.response_class(body, mimetype='application/json')
+
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # 브라우저가 매번 재검증하도록 (사용자별 응답이므로 공유 캐시에는 저장하지 않음)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
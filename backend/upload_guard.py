@@ -0,0 +1,146 @@
+# upload_guard.py
+# 업로드 파일을 디스크에 쓰거나 디코딩하기 전에 검사합니다.
+# (바이트 수 제한, 매직 바이트 확인, 헤더만 읽어 가로/세로/픽셀 수 확인, 큰 이미지는 디코딩 단계에서 축소)
+import os
+import logging
+
+from flask import request
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_MAX_FILE_BYTES = int(os.getenv('UPLOAD_MAX_FILE_BYTES', 15 * 1024 * 1024))
+# multipart 경계/폼 필드용 여유분 (요청 본문 한도 = 파일 수 x UPLOAD_MAX_FILE_BYTES + 여유분)
+UPLOAD_FORM_OVERHEAD_BYTES = int(os.getenv('UPLOAD_FORM_OVERHEAD_BYTES', 1024 * 1024))
+UPLOAD_MAX_PIXELS = int(os.getenv('UPLOAD_MAX_PIXELS', 40_000_000))
+UPLOAD_MAX_SIDE = int(os.getenv('UPLOAD_MAX_SIDE', 12_000))
+# 디코딩할 때 긴 변을 이 크기 근처까지 줄입니다. (YOLO 입력 640, ResNet 입력 224보다 충분히 큼)
+UPLOAD_DECODE_MAX_SIDE = int(os.getenv('UPLOAD_DECODE_MAX_SIDE', 2048))
+
+# PIL 자체의 decompression bomb 검사도 같은 한도로 맞춥니다.
+Image.MAX_IMAGE_PIXELS = UPLOAD_MAX_PIXELS
+
+_CHUNK_SIZE = 64 * 1024
+_SIGNATURES = (
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+)
+
+class UploadRejected(Exception):
+    """업로드 검사 실패. status_code는 응답 코드(400 또는 413)입니다."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+def sniff_format(head):
+    """파일 앞부분의 매직 바이트로 이미지 형식을 판별합니다. 허용되지 않는 형식이면 None"""
+    for signature, image_format in _SIGNATURES:
+        if head.startswith(signature):
+            return image_format
+    return None
+
+def check_image_header(stream):
+    """
+    스트림의 매직 바이트와 이미지 헤더만 읽어 형식과 크기를 검사합니다. (픽셀 데이터는 디코딩하지 않음)
+    검사 후 스트림 위치를 처음으로 되돌리고 (형식, (가로, 세로))를 반환합니다.
+    """
+    stream.seek(0)
+    image_format = sniff_format(stream.read(16))
+    stream.seek(0)
+    if image_format is None:
+        raise UploadRejected('이미지 파일(JPEG, PNG, GIF)만 업로드할 수 있습니다.')
+    try:
+        with Image.open(stream) as image:
+            width, height = image.size
+    except Image.DecompressionBombError:
+        raise UploadRejected('이미지 해상도가 너무 큽니다.', 413)
+    except Exception:
+        raise UploadRejected('이미지 헤더를 읽을 수 없습니다.')
+    finally:
+        stream.seek(0)
+    if width > UPLOAD_MAX_SIDE or height > UPLOAD_MAX_SIDE or width * height > UPLOAD_MAX_PIXELS:
+        raise UploadRejected(f'이미지 해상도가 너무 큽니다: {width}x{height}', 413)
+    return image_format, (width, height)
+
+def copy_limited(source, destination, max_bytes=None):
+    """source를 청크 단위로 복사하면서 max_bytes를 넘으면 즉시 중단합니다. 복사한 바이트 수를 반환합니다."""
+    max_bytes = UPLOAD_MAX_FILE_BYTES if max_bytes is None else max_bytes
+    copied = 0
+    while True:
+        chunk = source.read(_CHUNK_SIZE)
+        if not chunk:
+            return copied
+        copied += len(chunk)
+        if copied > max_bytes:
+            raise UploadRejected(f'파일 크기는 {max_bytes // (1024 * 1024)}MB를 넘을 수 없습니다.', 413)
+        destination.write(chunk)
+
+def request_body_limit(num_files=1):
+    """이미지 num_files장을 받는 요청의 본문 크기 한도"""
+    return num_files * UPLOAD_MAX_FILE_BYTES + UPLOAD_FORM_OVERHEAD_BYTES
+
+def allow_request_body(max_bytes):
+    """
+    현재 요청에만 MAX_CONTENT_LENGTH 대신 max_bytes 한도를 적용합니다.
+    werkzeug는 request.files/form에 처음 접근할 때 본문 전체를 받으므로 그 전에 호출해야 합니다.
+    """
+    request.max_content_length = max_bytes
+
+def inspect_upload(file_storage):
+    """werkzeug FileStorage의 크기와 이미지 헤더를 검사합니다. 디스크에는 아무것도 쓰지 않습니다."""
+    stream = file_storage.stream
+    if stream.seekable():
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        stream.seek(0)
+        if size > UPLOAD_MAX_FILE_BYTES:
+            raise UploadRejected(f'파일 크기는 {UPLOAD_MAX_FILE_BYTES // (1024 * 1024)}MB를 넘을 수 없습니다.', 413)
+    return check_image_header(stream)
+
+def save_upload(file_storage, filepath):
+    """업로드를 검사한 뒤 크기 제한을 지키며 filepath에 저장합니다. 실패하면 쓰던 파일을 지웁니다."""
+    inspect_upload(file_storage)
+    try:
+        with open(filepath, 'wb') as destination:
+            copy_limited(file_storage.stream, destination)
+    except Exception:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        raise
+
+def inspect_file(path):
+    """이미 저장된 파일의 크기와 이미지 헤더를 검사합니다."""
+    if os.path.getsize(path) > UPLOAD_MAX_FILE_BYTES:
+        raise UploadRejected(f'파일 크기는 {UPLOAD_MAX_FILE_BYTES // (1024 * 1024)}MB를 넘을 수 없습니다.', 413)
+    with open(path, 'rb') as stream:
+        return check_image_header(stream)
+
+def open_image(source, max_side=None):
+    """
+    이미지를 RGB로 디코딩합니다. 긴 변이 max_side보다 크면 JPEG는 draft()로 DCT 단계에서,
+    그 외 형식은 reduce()로 정수 배율만큼 줄여서 디코딩 비용과 메모리를 아낍니다.
+    원본 크기는 image.info['original_size']에 남겨 감지 박스를 원본 좌표로 되돌릴 때 사용합니다.
+    """
+    max_side = UPLOAD_DECODE_MAX_SIDE if max_side is None else max_side
+    image = Image.open(source)
+    original_size = image.size
+    longest = max(original_size)
+    if longest > max_side:
+        if image.format == 'JPEG':
+            image.draft('RGB', (original_size[0] * max_side // longest, original_size[1] * max_side // longest))
+        else:
+            factor = longest // max_side
+            if factor > 1:
+                image = image.reduce(factor)
+    image = image.convert('RGB')
+    image.info['original_size'] = original_size
+    return image
+
+def original_scale(image):
+    """open_image로 줄인 이미지 좌표를 원본 좌표로 바꾸는 (x 배율, y 배율)"""
+    original_width, original_height = image.info.get('original_size', image.size)
+    return original_width / image.size[0], original_height / image.size[1]
@@ -91,7 +91,8 @@ const AdminImageUploadPage = () => {
       }
 
       const data = await response.json();
-      setMessage('이미지 등록 성공! 감지 결과: ' + (data.detection_results || '없음'));
+      const labels = (data.detection_results || []).filter(d => d.label).map(d => d.label);
+      setMessage('이미지 등록 성공! 감지 결과: ' + (labels.length > 0 ? labels.join(', ') : '없음'));
       setDescription('');
       setLocation('');
       setSelectedImage(null);
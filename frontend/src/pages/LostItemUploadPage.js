@@ -83,11 +83,13 @@ const LostItemUploadPage = () => {
 
                 const data = await response.json();
                 setUploadedImageUrl(data.image_url);
-                setDetectedItems(data.predictions || []);
+                // info/warning/error 메시지를 제외한 실제 감지 결과만 사용
+                const predictions = (data.predictions || []).filter(p => p.label);
+                setDetectedItems(predictions);
 
                 // AI 감지 결과가 있다면 첫 번째 항목을 기본 설명으로 설정
-                if (data.predictions && data.predictions.length > 0) {
-                    setSelectedDescription(data.predictions[0].label);
+                if (predictions.length > 0) {
+                    setSelectedDescription(predictions[0].label);
                 } else {
                     setSelectedDescription(''); // 감지된 항목이 없으면 설명 초기화
                 }
@@ -151,9 +153,10 @@ const LostItemUploadPage = () => {
                     image_url: uploadedImageUrl,
                     description: (selectedDescription || '').trim(),
                     location: (location || '').trim(),
-                    detection_results: detectedItems.map(item => ({ 
+                    detection_results: detectedItems.filter(item => item.label).map(item => ({ 
                         label: item.label, 
-                        score: typeof item.score === 'number' && !isNaN(item.score) ? item.score : 0.0 
+                        confidence: typeof item.confidence === 'number' && !isNaN(item.confidence) ? item.confidence : 0.0,
+                        box: item.box
                     }))
                 }),
             });
@@ -248,7 +251,7 @@ const LostItemUploadPage = () => {
                     {detectedItems && detectedItems.length > 0 && <option disabled>--- AI 감지 결과 ---</option>}
                     {Array.isArray(detectedItems) && detectedItems.map((item, index) => (
                         <option key={`detected-${index}`} value={item.label ?? ''}>
-                            {item.label ?? '알 수 없음'} (확률: {typeof item.score === 'number' && !isNaN(item.score) ? (item.score * 100).toFixed(2) : '0.00'}%)
+                            {item.label ?? '알 수 없음'} (확률: {typeof item.confidence === 'number' && !isNaN(item.confidence) ? (item.confidence * 100).toFixed(2) : '0.00'}%)
                         </option>
                     ))}
                 </select>